@@ -0,0 +1,89 @@
+"""Бэкенды кэша под нагрузкой из нескольких процессов.
+
+Каждый процесс выполняет смесь get/set (по умолчанию 90/10) по общему
+набору ключей, как воркеры gunicorn. LocMemCache приведён для
+сравнения: он быстрее, но у каждого процесса свой, поэтому доля
+попаданий у него ниже, а сброс из одного процесса другим не виден.
+
+    python benchmarks/bench_cache.py --processes 4 --ops 20000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from common import PROJECT_DIR
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def make_cache(backend, location):
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure()
+    from django.utils.module_loading import import_string
+    params = {'OPTIONS': {'MAX_ENTRIES': 100_000}, 'TIMEOUT': 300}
+    path = location if backend != 'sqlite' else os.path.join(
+        location, 'cache.sqlite3'
+    )
+    return import_string(BACKENDS[backend])(path, params)
+
+
+def worker(args):
+    backend, location, ops, keys, write_ratio, seed = args
+    cache = make_cache(backend, location)
+    rnd = random.Random(seed)
+    value = {'html': 'x' * 2048}
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(ops):
+        key = f'page:{rnd.randrange(keys)}'
+        if rnd.random() < write_ratio:
+            cache.set(key, value)
+        elif cache.get(key) is not None:
+            hits += 1
+    return time.perf_counter() - started, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=20_000)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f'{args.processes} процессов × {args.ops} операций, '
+          f'{args.keys} ключей, записей {args.write_ratio:.0%}')
+    for backend in BACKENDS:
+        location = tempfile.mkdtemp(prefix='yatube-cache-')
+        try:
+            jobs = [
+                (backend, location, args.ops, args.keys, args.write_ratio, i)
+                for i in range(args.processes)
+            ]
+            started = time.perf_counter()
+            with Pool(args.processes) as pool:
+                results = pool.map(worker, jobs)
+            elapsed = time.perf_counter() - started
+        finally:
+            shutil.rmtree(location, ignore_errors=True)
+        total = args.ops * args.processes
+        reads = total * (1 - args.write_ratio)
+        hits = sum(hits for _, hits in results)
+        print(f'{backend:>10}: {total / elapsed:10.0f} оп/с, '
+              f'попаданий {hits / reads:6.1%}')
+
+
+if __name__ == '__main__':
+    main()
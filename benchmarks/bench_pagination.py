@@ -0,0 +1,97 @@
+"""Сравнение OFFSET- и keyset-пагинации ленты постов.
+
+Первая страница дополнительно меряется с COUNT(*) на каждый запрос
+и с числом постов из posts.counters.count.
+
+    python benchmarks/bench_pagination.py --posts 100000 --page 10000
+"""
+import argparse
+
+from common import setup_django, timeit
+
+
+def build_dataset(total, batch_size=5000):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from posts.models import Post
+
+    author = get_user_model().objects.create_user(username='bench')
+    start = timezone.now()
+    batch = []
+    for i in range(total):
+        batch.append(Post(author=author, text=f'Пост {i}'))
+        if len(batch) == batch_size:
+            Post.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Post.objects.bulk_create(batch)
+    # auto_now_add проставляет всем постам почти одинаковую дату,
+    # раскладываем их по времени одним UPDATE.
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE posts_post SET pub_date = '
+            "datetime(%s, '+' || id || ' seconds')",
+            [start.strftime('%Y-%m-%d %H:%M:%S')],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--page', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.paginator import Paginator
+    from posts import counters
+    from posts.models import Post
+    from posts.utils import (
+        FORWARD, POSTS_ON_PAGE, KeysetPaginator, encode_cursor,
+    )
+
+    build_dataset(args.posts)
+    posts = Post.objects.all()
+    last_page = min(args.page, -(-args.posts // POSTS_ON_PAGE))
+
+    def offset_page(number):
+        paginator = Paginator(posts.order_by('-pub_date', '-pk'),
+                              POSTS_ON_PAGE)
+        return lambda: list(paginator.get_page(number))
+
+    keyset = KeysetPaginator(posts, POSTS_ON_PAGE)
+    boundary = keyset.object_list[
+        (last_page - 1) * POSTS_ON_PAGE - 1
+    ] if last_page > 1 else None
+    deep_cursor = encode_cursor(boundary, FORWARD) if boundary else None
+
+    def cursor_page(cursor):
+        return lambda: list(
+            KeysetPaginator(posts, POSTS_ON_PAGE).get_cursor_page(cursor)
+        )
+
+    def counted_page(count):
+        return lambda: list(
+            KeysetPaginator(posts, POSTS_ON_PAGE, count=count).get_page(1)
+        )
+
+    counters.count('bench', posts, estimated=True)
+    results = {
+        ('count', 1): timeit(counted_page(None), args.repeat),
+        ('cached', 1): timeit(
+            lambda: counted_page(counters.count('bench', posts))(),
+            args.repeat,
+        ),
+        ('offset', 1): timeit(offset_page(1), args.repeat),
+        ('offset', last_page): timeit(offset_page(last_page), args.repeat),
+        ('cursor', 1): timeit(cursor_page(None), args.repeat),
+        ('cursor', last_page): timeit(cursor_page(deep_cursor), args.repeat),
+    }
+    print(f'{args.posts} постов, {POSTS_ON_PAGE} на странице')
+    for (mode, number), elapsed in results.items():
+        print(f'{mode:>7} страница {number:>6}: {elapsed:8.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
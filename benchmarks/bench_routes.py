@@ -0,0 +1,358 @@
+"""Задержка и пропускная способность всех адресов posts, users и about.
+
+Запросы идут через WSGI-приложение проекта (yatube.wsgi.application)
+в том же процессе, со всеми middleware, сессиями и CSRF. Набор данных
+строится benchmarks/dataset.py; с --db база сохраняется и при следующем
+запуске переиспользуется.
+
+Результаты пишутся в JSON. С --baseline прогон сравнивается с прошлым
+результатом, и если медиана какого-либо адреса выросла больше чем на
+--threshold, скрипт завершается с кодом 1 — так его можно ставить в CI.
+
+    python benchmarks/bench_routes.py --db /tmp/bench.sqlite3 \\
+        --output benchmarks/results/latest.json
+    python benchmarks/bench_routes.py --users 1000 --posts 20000 \\
+        --baseline benchmarks/results/latest.json --threshold 0.2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from statistics import mean
+from urllib.parse import urlencode
+
+from common import ROOT, setup_django
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scenario:
+    """Один замеряемый запрос к адресу."""
+
+    def __init__(self, route, path, method='GET', data=None, auth=False,
+                 fresh_session=False, label='', query=None):
+        self.route = route
+        self.path = path
+        self.query = urlencode(query or {})
+        self.method = method
+        self.data = data
+        self.auth = auth
+        self.fresh_session = fresh_session
+        self.name = route + (f' [{label}]' if label else '')
+
+
+def wsgi_call(application, scenario, cookie, csrf_token):
+    """Один запрос через WSGI; возвращает код ответа."""
+    from wsgiref.util import setup_testing_defaults
+
+    body = b''
+    environ = {
+        'REQUEST_METHOD': scenario.method,
+        'PATH_INFO': scenario.path,
+        'QUERY_STRING': scenario.query,
+        'HTTP_COOKIE': cookie,
+    }
+    if scenario.method == 'POST':
+        body = urlencode(
+            {**(scenario.data or {}), 'csrfmiddlewaretoken': csrf_token}
+        ).encode()
+        environ.update({
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+        })
+    setup_testing_defaults(environ)
+    environ['wsgi.input'] = io.BytesIO(body)
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split()[0]))
+
+    result = application(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0]
+
+
+def session_cookie(user, csrf_token):
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    return (
+        f'{settings.SESSION_COOKIE_NAME}={session}; '
+        f'{settings.CSRF_COOKIE_NAME}={csrf_token}'
+    )
+
+
+def build_scenarios():
+    """
+    Сценарии на каждый адрес posts, users и about.
+
+    Адрес без сценария — ошибка: новый маршрут не должен выпасть
+    из бенчмарка незамеченным.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.tokens import default_token_generator
+    from django.urls import get_resolver, reverse
+    from django.utils.encoding import force_bytes
+    from django.utils.http import urlsafe_base64_encode
+
+    from posts import uploads
+    from posts.models import Comment, Group, Post
+
+    User = get_user_model()
+    me = User.objects.get(username='user0')
+    other = User.objects.get(username='user1')
+    group = Group.objects.order_by('pk').first()
+    my_post = Post.objects.filter(author=me).latest('pub_date')
+    popular_post = Post.objects.order_by('-comments_count', '-pk').first()
+    thread = Comment.objects.filter(post=popular_post).order_by(
+        '-replies_count', 'pk'
+    ).first() or Comment.objects.create(
+        post=popular_post, author=me, text='Ветка для бенчмарка'
+    )
+    token = default_token_generator.make_token(me)
+    uid = urlsafe_base64_encode(force_bytes(me.pk))
+    upload_token = uploads.start(me, 1024)
+
+    def both(route, *args):
+        path = reverse(route, args=args)
+        return [
+            Scenario(route, path, label='anon'),
+            Scenario(route, path, auth=True, label='auth'),
+        ]
+
+    def anon(route, *args):
+        return [Scenario(route, reverse(route, args=args))]
+
+    def auth(route, *args, **kwargs):
+        return [Scenario(route, reverse(route, args=args), auth=True,
+                         **kwargs)]
+
+    scenarios = {
+        'posts:index': both('posts:index'),
+        'posts:trending': both('posts:trending'),
+        'posts:group_list': both('posts:group_list', group.slug),
+        'posts:profile': both('posts:profile', me.username),
+        'posts:post_detail': both('posts:post_detail', popular_post.pk),
+        'posts:search': anon('posts:search') + [Scenario(
+            'posts:search', reverse('posts:search'),
+            query={'q': 'кот'}, label='query',
+        )],
+        'posts:feed': anon('posts:feed', 'atom'),
+        'posts:group_feed': anon('posts:group_feed', group.slug, 'rss'),
+        'posts:profile_feed': anon(
+            'posts:profile_feed', me.username, 'json'
+        ),
+        'posts:comment_thread': both(
+            'posts:comment_thread', popular_post.pk, thread.pk
+        ),
+        'posts:post_edit': auth('posts:post_edit', my_post.pk),
+        'posts:post_create': auth('posts:post_create') + [Scenario(
+            'posts:post_create', reverse('posts:post_create'),
+            method='POST', data={'text': 'Пост из бенчмарка'},
+            auth=True, label='submit',
+        )],
+        'posts:add_comment': [Scenario(
+            'posts:add_comment',
+            reverse('posts:add_comment', args=(popular_post.pk,)),
+            method='POST', data={'text': 'Комментарий из бенчмарка'},
+            auth=True,
+        )],
+        'posts:upload_start': [Scenario(
+            'posts:upload_start', reverse('posts:upload_start'),
+            method='POST', data={'size': 1024}, auth=True,
+        )],
+        'posts:upload_chunk': auth('posts:upload_chunk', upload_token),
+        'posts:follow_index': auth('posts:follow_index'),
+        'posts:profile_follow': auth('posts:profile_follow', other.username),
+        'posts:profile_unfollow': auth(
+            'posts:profile_unfollow', other.username
+        ),
+        'users:logout': auth('users:logout', fresh_session=True),
+        'users:signup': anon('users:signup'),
+        'users:login': anon('users:login'),
+        'users:password_change': auth('users:password_change'),
+        'users:password_change_done': auth('users:password_change_done'),
+        'users:password_reset_form': anon('users:password_reset_form'),
+        'users:password_reset_done': anon('users:password_reset_done'),
+        'users:password_reset_confirm': anon(
+            'users:password_reset_confirm', uid, token
+        ),
+        'users:password_reset_complete': anon(
+            'users:password_reset_complete'
+        ),
+        'users:contact': anon('users:contact'),
+        'users:thank-you': anon('users:thank-you'),
+        'about:author': anon('about:author'),
+        'about:tech': anon('about:tech'),
+    }
+    routes = set()
+    for pattern in get_resolver().url_patterns:
+        namespace = getattr(pattern, 'namespace', None)
+        if namespace in ('posts', 'users', 'about'):
+            routes.update(
+                f'{namespace}:{child.name}' for child in pattern.url_patterns
+            )
+    missing = routes - set(scenarios)
+    if missing:
+        raise SystemExit(f'Нет сценария для адресов: {sorted(missing)}')
+    flat = [scenario for group in scenarios.values() for scenario in group]
+    return flat, me
+
+
+def percentile(values, percent):
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def measure(application, scenario, me, iterations, warmup, concurrency):
+    from django.middleware.csrf import _get_new_csrf_token
+
+    csrf_token = _get_new_csrf_token()
+    cookie = session_cookie(me, csrf_token) if scenario.auth else (
+        f'csrftoken={csrf_token}'
+    )
+    statuses = set()
+
+    def one(_):
+        request_cookie = cookie
+        if scenario.fresh_session:
+            request_cookie = session_cookie(me, csrf_token)
+        started = time.perf_counter()
+        statuses.add(wsgi_call(application, scenario, request_cookie,
+                               csrf_token))
+        return (time.perf_counter() - started) * 1000
+
+    for number in range(warmup):
+        one(number)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(one, range(iterations)))
+    else:
+        samples = [one(number) for number in range(iterations)]
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    result = {
+        'method': scenario.method,
+        'path': scenario.path,
+        'statuses': sorted(statuses),
+        'requests': iterations,
+        'mean_ms': round(mean(samples), 3),
+        'rps': round(iterations / elapsed, 1),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(samples, percent), 3)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Адреса, медиана которых выросла больше чем на threshold."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        limit = before['p50_ms'] * (1 + threshold)
+        if result['p50_ms'] > limit:
+            regressions.append(
+                f'{name}: p50 {before["p50_ms"]:.2f} -> '
+                f'{result["p50_ms"]:.2f} мс'
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', help='Файл базы; переиспользуется, если есть.')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--only', help='Только адреса с этой подстрокой.')
+    parser.add_argument(
+        '--output',
+        default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'),
+    )
+    parser.add_argument('--baseline', help='JSON прошлого прогона.')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    reuse = bool(args.db) and os.path.exists(args.db)
+    setup_django(args.db)
+    import django
+
+    if not reuse:
+        import dataset
+        started = time.perf_counter()
+        dataset.build(args.users, args.posts, args.groups, seed=args.seed)
+        print(f'Набор данных за {time.perf_counter() - started:.1f} с')
+    from yatube.wsgi import application
+
+    scenarios, me = build_scenarios()
+    results = {}
+    failed = []
+    for scenario in scenarios:
+        if args.only and args.only not in scenario.name:
+            continue
+        result = measure(
+            application, scenario, me,
+            args.iterations, args.warmup, args.concurrency,
+        )
+        results[scenario.name] = result
+        if any(status >= 400 for status in result['statuses']):
+            failed.append(f'{scenario.name}: ответ {result["statuses"]}')
+        print(
+            f'{scenario.name:<40} {result["p50_ms"]:8.2f} '
+            f'{result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} мс '
+            f'{result["rps"]:8.1f} rps {result["statuses"]}'
+        )
+
+    from django.contrib.auth import get_user_model
+    from posts.models import Post
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'users': get_user_model().objects.count(),
+            'posts': Post.objects.count(),
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+        },
+        'routes': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+    print(f'Результаты: {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline:
+            failed += compare(
+                results, json.load(baseline)['routes'], args.threshold
+            )
+    if failed:
+        print('\n'.join(['Провал:'] + failed), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
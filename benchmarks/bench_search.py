@@ -0,0 +1,70 @@
+"""Полнотекстовый поиск FTS5 против LIKE '%…%' на большом наборе постов.
+
+    python benchmarks/bench_search.py --posts 1000000
+"""
+import argparse
+import random
+
+from common import setup_django, timeit
+
+WORDS = (
+    'кот кота коту котами собака собаки лает гуляли парк парке город '
+    'города утро вечер дождь солнце программирование программист python '
+    'django база данных индекс запрос поиск новости друзья книга книги '
+    'читать читали музыка концерт путешествие море горы поезд самолёт'
+).split()
+
+
+def build_dataset(total, batch_size=20000):
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    author = get_user_model().objects.create_user(username='bench')
+    now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    rnd = random.Random(42)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, total, batch_size):
+            rows = [
+                (' '.join(rnd.choices(WORDS, k=30)), now, author.pk, '', 0,
+                 '', 0, 0)
+                for _ in range(min(batch_size, total - start))
+            ]
+            cursor.executemany(
+                'INSERT INTO posts_post (text, pub_date, author_id, image, '
+                'comments_count, thumbnails, views_count, unique_viewers) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+    from posts import search
+    with transaction.atomic():
+        search.rebuild()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from posts import search
+    from posts.models import Post
+
+    build_dataset(args.posts)
+    print(f'{args.posts} постов')
+    for query in ('программистами', 'кот парк', 'самолёт море поезд',
+                  'несуществующее'):
+        fts = timeit(lambda: search.search(query), args.repeat)
+        first_word = query.split()[0]
+        like = timeit(
+            lambda: list(
+                Post.objects.filter(text__icontains=first_word)[:10]
+            ),
+            args.repeat,
+        )
+        print(f'{query!r:>24}: FTS5 {fts:8.2f} мс, LIKE {like:8.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
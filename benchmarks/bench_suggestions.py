@@ -0,0 +1,65 @@
+"""Время пакетного пересчёта рекомендаций «на кого подписаться».
+
+По умолчанию граф около миллиона подписок: 60 000 пользователей,
+в среднем по 20 подписок со скосом Ципфа (benchmarks/dataset.py).
+Замеряются загрузка графа, подсчёт кандидатов и запись таблицы, а
+затем чтение рекомендаций страницей — из базы и из кэша.
+
+    python benchmarks/bench_suggestions.py --users 60000 --follows 20
+    python benchmarks/bench_suggestions.py --db /tmp/follow.sqlite3
+"""
+import argparse
+import os
+import time
+
+from common import setup_django, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=60_000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--db', help='Файл базы; переиспользуется, если есть.')
+    args = parser.parse_args()
+
+    reuse = bool(args.db) and os.path.exists(args.db)
+    setup_django(args.db)
+    if not reuse:
+        import dataset
+        dataset.build(
+            args.users, args.posts, args.groups, follows=args.follows
+        )
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+
+    from posts import suggestions
+    from posts.models import Follow
+
+    print(f'{Follow.objects.count()} подписок')
+    started = time.perf_counter()
+    graph = suggestions.Graph.load()
+    loaded = time.perf_counter()
+    leaders, groups = suggestions._group_authors()
+    rows = sum(1 for _ in suggestions._rows(graph, leaders, groups))
+    scored = time.perf_counter()
+    print(f'Загрузка графа: {loaded - started:8.2f} с')
+    print(f'Подсчёт {rows} рекомендаций: {scored - loaded:8.2f} с')
+    started = time.perf_counter()
+    suggestions.rebuild()
+    print(f'Пересчёт с записью: {time.perf_counter() - started:8.2f} с')
+
+    user = get_user_model().objects.get(username='user100')
+
+    def from_db():
+        cache.clear()
+        suggestions.for_user(user)
+
+    print(f'Чтение из базы: {timeit(from_db):8.3f} мс')
+    cached = timeit(lambda: suggestions.for_user(user))
+    print(f'Чтение из кэша: {cached:8.3f} мс')
+
+
+if __name__ == '__main__':
+    main()
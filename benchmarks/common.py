@@ -0,0 +1,56 @@
+"""Общая подготовка окружения для бенчмарков.
+
+Бенчмарки запускаются отдельными скриптами из корня репозитория:
+
+    python benchmarks/bench_pagination.py
+
+База данных каждого прогона — временный файл SQLite, рабочая
+db.sqlite3 проекта не затрагивается, как и yatube/media: загрузки
+и миниатюры пишутся во временный каталог прогона.
+"""
+import os
+import sys
+import tempfile
+import time
+from statistics import median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT, 'yatube')
+
+
+def setup_django(db_path=None):
+    """
+    Настраивает Django на временную БД и применяет миграции.
+
+    db_path позволяет переиспользовать базу между прогонами (например,
+    с уже построенным большим набором данных). Общий кэш и MEDIA_ROOT
+    тоже переносятся во временный каталог.
+    """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    from django.conf import settings
+
+    db_dir = tempfile.mkdtemp(prefix='yatube-bench-')
+    settings.DATABASES['default']['NAME'] = db_path or os.path.join(
+        db_dir, 'bench.sqlite3'
+    )
+    for params in settings.CACHES.values():
+        if params['BACKEND'] == 'core.cache_backends.SQLiteCache':
+            params['LOCATION'] = os.path.join(db_dir, 'cache.sqlite3')
+    settings.MEDIA_ROOT = os.path.join(db_dir, 'media')
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0, interactive=False)
+    return db_dir
+
+
+def timeit(func, repeat=20):
+    """Медиана времени выполнения func в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return median(samples)
@@ -0,0 +1,105 @@
+"""Воспроизводимый набор данных для нагрузочных прогонов.
+
+Пользователи, группы, подписки и посты создаются пачками bulk_create
+мимо сигналов, а производные данные (счётчики, ленты подписок,
+поисковый индекс) строятся в конце одним проходом каждое. Граф подписок
+и авторство постов скошены по закону Ципфа: немногие авторы пишут
+много и собирают большинство подписчиков, как в живых соцсетях.
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+BATCH_SIZE = 10_000
+WORDS = (
+    'кот собака парк город море поезд самолёт книга музыка кино погода '
+    'утро вечер ночь работа отпуск друзья семья праздник новости код '
+    'программист python django база запрос кэш сервер ответ страница '
+    'лента подписка автор группа фото прогулка дорога река лес горы '
+    'снег дождь солнце кофе чай завтрак обед ужин рецепт вкусно быстро '
+    'медленно красиво сегодня вчера завтра всегда никогда очень почти'
+).split()
+
+
+def _zipf_weights(count, exponent):
+    """Накопленные веса закона Ципфа для random.choices(cum_weights=...)."""
+    return list(
+        accumulate(1 / (rank + 1) ** exponent for rank in range(count))
+    )
+
+
+def _text(rng):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(5, 60))).capitalize()
+
+
+def build(users=10_000, posts=1_000_000, groups=50, follows=20, seed=1,
+          log=print):
+    """
+    Заполняет пустую базу. Пользователь user0 — самый популярный автор,
+    его и используют бенчмарки как «себя».
+    """
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from posts import bulk, counters, search, timeline
+    from posts.models import Follow, Group, Post
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    # Без batch_size: размер пачки под пределы SQLite (999 параметров,
+    # 500 строк в составном SELECT) подбирает сам Django. Явные
+    # BATCH_SIZE строк падали уже на 10 000 пользователей.
+    User.objects.bulk_create([
+        User(username=f'user{i}', first_name='Имя', last_name=f'{i}',
+             password='!')
+        for i in range(users)
+    ])
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create([
+        Group(title=f'Группа {i}', slug=f'group{i}', description=_text(rng))
+        for i in range(groups)
+    ])
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    log(f'{users} пользователей, {groups} групп')
+
+    popularity = _zipf_weights(users, 1.1)
+    batch = []
+    for user_id in user_ids:
+        count = min(users - 1, int(rng.expovariate(1 / follows)) + 1)
+        authors = set(rng.choices(user_ids, cum_weights=popularity, k=count))
+        authors.discard(user_id)
+        batch.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in authors
+        )
+        if len(batch) >= BATCH_SIZE:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Follow.objects.bulk_create(batch, ignore_conflicts=True)
+    log(f'{Follow.objects.count()} подписок')
+
+    productivity = _zipf_weights(users, 1.0)
+    started = timezone.now() - timedelta(days=365)
+    step = timedelta(days=365) / max(posts, 1)
+    with bulk.explicit_pub_date():
+        for offset in range(0, posts, BATCH_SIZE):
+            size = min(BATCH_SIZE, posts - offset)
+            authors = rng.choices(user_ids, cum_weights=productivity, k=size)
+            Post.objects.bulk_create([
+                Post(
+                    author_id=author_id,
+                    group_id=(
+                        rng.choice(group_ids) if rng.random() < 0.7 else None
+                    ),
+                    text=_text(rng),
+                    pub_date=started + step * (offset + number),
+                )
+                for number, author_id in enumerate(authors)
+            ])
+            log(f'\r{offset + size} постов', end='')
+    log('')
+    counters.reconcile()
+    timeline.rebuild()
+    if search.is_available():
+        search.rebuild()
+    log('Счётчики, ленты и поисковый индекс построены')
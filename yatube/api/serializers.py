@@ -0,0 +1,66 @@
+"""
+Сериализаторы API.
+
+Строки берутся из базы через values_list() без создания экземпляров
+моделей, а в словари превращаются распаковкой кортежа: на каждую запись
+приходится один dict и ни одного лишнего объекта.
+"""
+import json
+
+from django.core.files.storage import default_storage
+
+POST_FIELDS = (
+    'pk', 'text', 'pub_date', 'image', 'thumbnails', 'comments_count',
+    'author__username', 'group_id', 'group__slug', 'group__title',
+)
+GROUP_FIELDS = ('slug', 'title', 'description', 'posts_count')
+COMMENT_FIELDS = (
+    'pk', 'pub_date', 'text', 'post_id', 'author__username', 'parent_id',
+    'replies_count',
+)
+FOLLOW_FIELDS = ('pk', 'pub_date', 'author__username')
+
+
+def post(row):
+    (pk, text, pub_date, image, thumbnails, comments_count,
+     author, group_id, group_slug, group_title) = row
+    return {
+        'id': pk,
+        'text': text,
+        'pub_date': pub_date.isoformat(),
+        'author': author,
+        'group': {
+            'id': group_id, 'slug': group_slug, 'title': group_title,
+        } if group_id else None,
+        'image': default_storage.url(image) if image else None,
+        'thumbnails': json.loads(thumbnails) if thumbnails else {},
+        'comments_count': comments_count,
+    }
+
+
+def group(row):
+    slug, title, description, posts_count = row
+    return {
+        'slug': slug,
+        'title': title,
+        'description': description,
+        'posts_count': posts_count,
+    }
+
+
+def comment(row):
+    pk, pub_date, text, post_id, author, parent_id, replies_count = row
+    return {
+        'id': pk,
+        'pub_date': pub_date.isoformat(),
+        'text': text,
+        'post': post_id,
+        'author': author,
+        'parent': parent_id,
+        'replies_count': replies_count,
+    }
+
+
+def follow(row):
+    _, pub_date, author = row
+    return {'author': author, 'since': pub_date.isoformat()}
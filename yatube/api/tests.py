@@ -0,0 +1,258 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(15)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def post_json(self, client, url, data, method='post'):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_post_list_is_paginated_by_cursor(self):
+        """Список постов листается курсором и не теряет записей."""
+        url = reverse('api:post_list')
+        first = self.guest_client.get(url).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['text'], 'Пост 14')
+        self.assertEqual(first['results'][0]['group']['slug'], 'test_slug')
+        second = self.guest_client.get(
+            url, {'cursor': first['next_cursor']}
+        ).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next_cursor'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_conditional_get_skips_database(self):
+        """Совпавший ETag даёт 304 без запросов к базе."""
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.post_json(
+            self.author_client, url, {'text': 'Новый текст'}, method='patch'
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['text'], 'Новый текст')
+        self.assertEqual(response.json()['group']['id'], self.group.pk)
+
+    def etag_then_get(self, url, change):
+        """Ответ на условный GET после изменения change()."""
+        etag = self.guest_client.get(url)['ETag']
+        change()
+        return self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_comment_changes_post_list_etag(self):
+        """Новый комментарий меняет comments_count в списках постов."""
+        post = self.posts[-1]
+        for url in (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=(self.group.slug,)),
+        ):
+            with self.subTest(url=url):
+                response = self.etag_then_get(
+                    url,
+                    lambda: Comment.objects.create(
+                        post=post, author=self.reader, text='Да'
+                    ),
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    response.json()['results'][0]['comments_count'],
+                    Comment.objects.filter(post=post).count(),
+                )
+
+    def test_new_post_changes_group_list_etag(self):
+        """Новый пост в группе меняет posts_count в списке групп."""
+        response = self.etag_then_get(
+            reverse('api:group_list'),
+            lambda: Post.objects.create(
+                author=self.author, text='Ещё', group=self.group
+            ),
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['posts_count'], 16)
+
+    def test_create_post_uses_post_form(self):
+        """Создание поста проверяется PostForm и требует авторизации."""
+        url = reverse('api:post_list')
+        response = self.post_json(self.guest_client, url, {'text': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.post_json(self.author_client, url, {'text': ''})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+        response = self.post_json(
+            self.author_client, url,
+            {'text': 'Пост из API', 'group': self.group.pk},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(response['Location'], reverse(
+            'api:post_detail', args=(post.pk,)
+        ))
+
+    def test_only_author_can_edit(self):
+        """Чужой пост редактировать нельзя."""
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        response = self.post_json(
+            self.reader_client, url, {'text': 'Чужой'}, method='patch'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('api:post_detail', args=(10 ** 6,))
+            ).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_comments(self):
+        """Комментарии создаются через CommentForm и листаются по порядку."""
+        post = self.posts[0]
+        url = reverse('api:comment_list', args=(post.pk,))
+        for i in range(3):
+            response = self.post_json(
+                self.reader_client, url, {'text': f'Комментарий {i}'}
+            )
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        page = self.guest_client.get(url, {'limit': 2}).json()
+        self.assertEqual(
+            [comment['text'] for comment in page['results']],
+            ['Комментарий 0', 'Комментарий 1'],
+        )
+        rest = self.guest_client.get(
+            url, {'cursor': page['next_cursor']}
+        ).json()
+        self.assertEqual(rest['results'][0]['author'], 'reader')
+        self.assertEqual(Comment.objects.filter(post=post).count(), 3)
+        first = page['results'][0]['id']
+        reply = self.post_json(
+            self.reader_client, url, {'text': 'Ответ', 'parent': first}
+        ).json()
+        self.assertEqual(reply['parent'], first)
+        self.assertEqual(
+            Comment.objects.get(pk=first).replies_count, 1
+        )
+
+    def test_groups(self):
+        """Группы и их посты доступны анонимам."""
+        groups = self.guest_client.get(reverse('api:group_list')).json()
+        self.assertEqual(groups['results'][0]['posts_count'], 15)
+        detail = self.guest_client.get(
+            reverse('api:group_detail', args=(self.group.slug,))
+        )
+        self.assertEqual(detail.json()['title'], self.group.title)
+        posts = self.guest_client.get(
+            reverse('api:group_posts', args=(self.group.slug,))
+        ).json()
+        self.assertEqual(len(posts['results']), 10)
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('api:group_posts', args=('missing',))
+            ).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_follow_and_unfollow(self):
+        """Подписка меняет и данные, и ETag списка подписок."""
+        url = reverse('api:follow_list')
+        self.assertEqual(
+            self.guest_client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        etag = self.reader_client.get(url)['ETag']
+        response = self.post_json(
+            self.reader_client, url, {'author': 'author'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response = self.post_json(
+            self.reader_client, url, {'author': 'reader'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['author'], 'author')
+        response = self.reader_client.delete(
+            reverse('api:follow_detail', args=('author',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+
+    def test_writes_require_csrf_token(self):
+        """Запись по сессии требует X-CSRFToken из cookie, выданной GET."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        url = reverse('api:post_list')
+        response = self.post_json(client, url, {'text': 'Без токена'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertIn('CSRF', response.json()['detail'])
+        self.assertFalse(Post.objects.filter(text='Без токена').exists())
+        self.assertNotIn('csrftoken', self.guest_client.get(url).cookies)
+        client.get(url)
+        token = client.cookies['csrftoken'].value
+        post = self.posts[0]
+        writes = (
+            ('post', url, {'text': 'С токеном'}, HTTPStatus.CREATED),
+            ('post', reverse('api:comment_list', args=(post.pk,)),
+             {'text': 'Комментарий'}, HTTPStatus.CREATED),
+            ('post', reverse('api:follow_list'), {'author': 'author'},
+             HTTPStatus.CREATED),
+            ('delete', reverse('api:follow_detail', args=('author',)), {},
+             HTTPStatus.NO_CONTENT),
+        )
+        for method, write_url, data, status in writes:
+            with self.subTest(method=method, url=write_url):
+                response = getattr(client, method)(
+                    write_url, json.dumps(data),
+                    content_type='application/json',
+                    HTTP_X_CSRFTOKEN=token,
+                )
+                self.assertEqual(response.status_code, status)
+        own = Post.objects.get(text='С токеном')
+        detail = reverse('api:post_detail', args=(own.pk,))
+        response = self.post_json(
+            client, detail, {'text': 'Правка'}, method='patch'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = client.patch(
+            detail, json.dumps({'text': 'Правка'}),
+            content_type='application/json', HTTP_X_CSRFTOKEN=token,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
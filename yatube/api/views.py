@@ -0,0 +1,335 @@
+"""
+JSON API постов, групп, комментариев и подписок.
+
+Запись идёт через те же PostForm/CommentForm, что и в HTML-версии.
+ETag и Last-Modified считаются по версиям тегов из posts.caching,
+поэтому условный GET с совпавшим ETag отвечает 304, не обращаясь к базе.
+
+Авторизация — сессия сайта, поэтому запись (POST, PATCH, DELETE)
+защищена от CSRF так же, как HTML-формы. Любой GET к API от вошедшего
+пользователя выдаёт cookie csrftoken; её значение клиент передаёт
+в заголовке X-CSRFToken. Без заголовка запись отклоняется с 403.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.views.decorators.http import condition, require_http_methods
+from django.views.decorators.vary import vary_on_cookie
+
+from posts import caching, threads, thumbnails
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import FORWARD, POSTS_ON_PAGE, decode_cursor, encode_position
+
+from . import serializers
+
+MAX_PAGE_SIZE: int = 100  # больше записей за запрос не отдаём
+
+
+def _json(data, status=200):
+    return JsonResponse(
+        data, status=status, safe=False,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def _error(status, message, **extra):
+    return _json({'detail': message, **extra}, status=status)
+
+
+def _payload(request):
+    """Данные запроса: JSON-тело или обычная форма."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def _form_error(form):
+    return _error(
+        400, 'Некорректные данные.', errors=form.errors.get_json_data()
+    )
+
+
+def login_required_for_writes(view):
+    """
+    Анонимам доступно только чтение: на запись отвечаем 401.
+
+    Вошедшему пользователю чтение выдаёт cookie csrftoken для записи.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            if request.user.is_authenticated:
+                get_token(request)
+        elif not request.user.is_authenticated:
+            return _error(401, 'Требуется авторизация.')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def versioned(*tags, private=False):
+    """
+    Условные запросы по версиям тегов кэша.
+
+    Теги — шаблоны, в которые подставляются аргументы URL и {user}
+    (имя текущего пользователя). private=True добавляет пользователя
+    в ETag для ответов, которые у каждого свои.
+    """
+    def resolve(request, kwargs):
+        return [
+            tag.format(user=request.user.get_username(), **kwargs)
+            for tag in tags
+        ]
+
+    def etag(request, *args, **kwargs):
+        versions = caching.versions(resolve(request, kwargs))
+        owner = request.user.pk if private else ''
+        raw = f'{request.get_full_path()}|{owner}|{versions}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(
+            caching.last_modified(resolve(request, kwargs)), timezone.utc
+        )
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+        return vary_on_cookie(view) if private else view
+    return decorator
+
+
+def _paginate(request, queryset, fields, serializer, descending=True):
+    """
+    Страница по курсору (pub_date, id), без COUNT и OFFSET.
+
+    Курсор следующей страницы приходит в поле next_cursor и передаётся
+    обратно параметром ?cursor=.
+    """
+    try:
+        limit = int(request.GET.get('limit', POSTS_ON_PAGE))
+    except ValueError:
+        limit = POSTS_ON_PAGE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_cursor(request.GET.get('cursor') or '')
+    if descending:
+        queryset = queryset.order_by('-pub_date', '-pk')
+    else:
+        queryset = queryset.order_by('pub_date', 'pk')
+    if position is not None and position[2] == FORWARD:
+        pub_date, pk, _ = position
+        if descending:
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        else:
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            )
+    pk_index = fields.index('pk')
+    date_index = fields.index('pub_date')
+    rows = list(queryset.values_list(*fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_position(last[date_index], last[pk_index])
+    return _json({
+        'results': [serializer(row) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+def _post_response(post_id, status=200):
+    row = Post.objects.filter(pk=post_id).values_list(
+        *serializers.POST_FIELDS
+    ).first()
+    if row is None:
+        return _error(404, 'Пост не найден.')
+    response = _json(serializers.post(row), status=status)
+    if status == 201:
+        response['Location'] = reverse('api:post_detail', args=(post_id,))
+    return response
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@login_required_for_writes
+@versioned('posts', 'groups', 'users', 'comments')
+def post_list(request):
+    if request.method == 'POST':
+        return _create_post(request)
+    return _paginate(
+        request, Post.objects.all(),
+        serializers.POST_FIELDS, serializers.post,
+    )
+
+
+@transaction.atomic
+def _create_post(request):
+    data = _payload(request)
+    if data is None:
+        return _error(400, 'Тело запроса не является объектом JSON.')
+    form = PostForm(data, files=request.FILES or None)
+    if not form.is_valid():
+        return _form_error(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    thumbnails.schedule(post)
+    return _post_response(post.pk, status=201)
+
+
+@require_http_methods(['GET', 'HEAD', 'PATCH'])
+@login_required_for_writes
+@versioned('post:{post_id}', 'groups', 'users')
+def post_detail(request, post_id):
+    if request.method == 'PATCH':
+        return _edit_post(request, post_id)
+    return _post_response(post_id)
+
+
+@transaction.atomic
+def _edit_post(request, post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return _error(404, 'Пост не найден.')
+    if post.author_id != request.user.pk:
+        return _error(403, 'Редактировать пост может только автор.')
+    data = _payload(request)
+    if data is None:
+        return _error(400, 'Тело запроса не является объектом JSON.')
+    # PATCH меняет только переданные поля, остальные берём из поста.
+    data = {'text': post.text, 'group': post.group_id, **data}
+    form = PostForm(data, instance=post)
+    if not form.is_valid():
+        return _form_error(form)
+    form.save()
+    return _post_response(post.pk)
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@login_required_for_writes
+@versioned('post:{post_id}', 'users')
+def comment_list(request, post_id):
+    if request.method == 'POST':
+        return _create_comment(request, post_id)
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error(404, 'Пост не найден.')
+    return _paginate(
+        request, Comment.objects.filter(post_id=post_id),
+        serializers.COMMENT_FIELDS, serializers.comment,
+        descending=False,
+    )
+
+
+@transaction.atomic
+def _create_comment(request, post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return _error(404, 'Пост не найден.')
+    data = _payload(request)
+    if data is None:
+        return _error(400, 'Тело запроса не является объектом JSON.')
+    form = CommentForm(data)
+    if not form.is_valid():
+        return _form_error(form)
+    comment = form.save(commit=False)
+    if data.get('parent') is not None:
+        try:
+            comment.parent = threads.resolve_parent(post.pk, data['parent'])
+        except Comment.DoesNotExist:
+            return _error(400, 'Комментарий parent не найден.')
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    row = Comment.objects.filter(pk=comment.pk).values_list(
+        *serializers.COMMENT_FIELDS
+    ).get()
+    return _json(serializers.comment(row), status=201)
+
+
+@require_http_methods(['GET', 'HEAD'])
+@versioned('groups', 'group_counts')
+def group_list(request):
+    rows = Group.objects.order_by('title').values_list(
+        *serializers.GROUP_FIELDS
+    )
+    return _json({'results': [serializers.group(row) for row in rows]})
+
+
+@require_http_methods(['GET', 'HEAD'])
+@versioned('groups', 'group:{slug}')
+def group_detail(request, slug):
+    row = Group.objects.filter(slug=slug).values_list(
+        *serializers.GROUP_FIELDS
+    ).first()
+    if row is None:
+        return _error(404, 'Группа не найдена.')
+    return _json(serializers.group(row))
+
+
+@require_http_methods(['GET', 'HEAD'])
+@versioned('groups', 'group:{slug}', 'users', 'comments')
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return _error(404, 'Группа не найдена.')
+    return _paginate(
+        request, Post.objects.filter(group_id=group_id),
+        serializers.POST_FIELDS, serializers.post,
+    )
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@login_required_for_writes
+@versioned('author:{user}', 'users', private=True)
+def follow_list(request):
+    if request.method == 'POST':
+        return _follow(request)
+    if not request.user.is_authenticated:
+        return _error(401, 'Требуется авторизация.')
+    return _paginate(
+        request, Follow.objects.filter(user=request.user),
+        serializers.FOLLOW_FIELDS, serializers.follow,
+    )
+
+
+@transaction.atomic
+def _follow(request):
+    data = _payload(request)
+    if data is None:
+        return _error(400, 'Тело запроса не является объектом JSON.')
+    author = User.objects.filter(username=data.get('author')).first()
+    if author is None:
+        return _error(404, 'Автор не найден.')
+    if author == request.user:
+        return _error(400, 'Нельзя подписаться на самого себя.')
+    follow, created = Follow.objects.get_or_create(
+        user=request.user, author=author
+    )
+    row = (follow.pk, follow.pub_date, author.username)
+    return _json(serializers.follow(row), status=201 if created else 200)
+
+
+@require_http_methods(['DELETE'])
+@login_required_for_writes
+@transaction.atomic
+def follow_detail(request, username):
+    Follow.objects.filter(
+        user=request.user, author__username=username
+    ).delete()
+    return HttpResponse(status=204)
@@ -0,0 +1,486 @@
+"""
+Кэш в файле SQLite, общий для всех процессов сервера, и двухуровневый
+кэш с локальной памятью процесса перед ним.
+
+LocMemCache у каждого воркера gunicorn свой: кэш холодный, сброс версий
+из одного воркера не виден другим, память дублируется. Этот бэкенд
+держит записи в одном файле SQLite (режим WAL), так что читать его
+могут все процессы параллельно, а запись сериализует сама SQLite.
+
+Настройки (CACHES[...]['OPTIONS']):
+    MAX_ENTRIES    — предел числа записей (по умолчанию 300);
+    MAX_SIZE       — предел суммарного размера значений в байтах;
+    CULL_FREQUENCY — при переполнении удаляется 1/CULL_FREQUENCY записей,
+                     давно не читавшихся (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+from . import instrumentation
+
+# Время последнего чтения обновляется не чаще раза в секунду,
+# чтобы горячие ключи не превращали каждое чтение в запись.
+ACCESS_RESOLUTION: float = 1.0
+BUSY_TIMEOUT_MS: int = 5000
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' size INTEGER NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_entry_accessed'
+    ' ON cache_entry (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires'
+    ' ON cache_entry (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+    ' entries INTEGER NOT NULL,'
+    ' bytes INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT'
+    ' ON cache_entry BEGIN UPDATE cache_stats SET'
+    ' entries = entries + 1, bytes = bytes + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE'
+    ' ON cache_entry BEGIN UPDATE cache_stats SET'
+    ' entries = entries - 1, bytes = bytes - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_update AFTER UPDATE OF size'
+    ' ON cache_entry BEGIN UPDATE cache_stats SET'
+    ' bytes = bytes - old.size + new.size; END',
+)
+
+
+def _dump(value):
+    # Целые числа храним как INTEGER, чтобы incr() был одним UPDATE.
+    if type(value) is int:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _load(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE')
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединения SQLite нельзя делить между потоками и после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        # Иначе INSERT OR REPLACE не вызывает триггер удаления
+        # и счётчики cache_stats расходятся.
+        connection.execute('PRAGMA recursive_triggers = ON')
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _write(self):
+        """Транзакция записи; BEGIN IMMEDIATE сразу берёт блокировку."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        return _Transaction(connection)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        data, size = _dump(value)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache_entry VALUES (?, ?, ?, ?, ?)',
+                (key, data, size, self.get_backend_timeout(timeout), now),
+            ).rowcount
+            self._cull(connection)
+        return bool(added)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT key, value, expires, accessed FROM cache_entry '
+            'WHERE key IN (%s)' % ', '.join('?' * len(keys)),
+            keys,
+        ).fetchall()
+        found, expired, touched = {}, [], []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append(key)
+                continue
+            found[key] = _load(value)
+            if accessed < now - ACCESS_RESOLUTION:
+                touched.append(key)
+        instrumentation.count_cache('shared hit', len(found))
+        instrumentation.count_cache('shared miss', len(keys) - len(found))
+        if expired or touched:
+            with self._write() as connection:
+                connection.executemany(
+                    'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                    [(key, now) for key in expired],
+                )
+                connection.executemany(
+                    'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in touched],
+                )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            dumped, size = _dump(value)
+            rows.append((self._key(key, version), dumped, size, expires, now))
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache_entry VALUES (?, ?, ?, ?, ?)',
+                rows,
+            )
+            self._cull(connection)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            return bool(connection.execute(
+                'UPDATE cache_entry SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            updated = connection.execute(
+                'UPDATE cache_entry SET value = value + ? WHERE key = ? '
+                "AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, key, time.time()),
+            ).rowcount
+            if not updated:
+                raise ValueError("Key '%s' not found" % key)
+            return connection.execute(
+                'SELECT value FROM cache_entry WHERE key = ?', (key,)
+            ).fetchone()[0]
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._write() as connection:
+            connection.executemany(
+                'DELETE FROM cache_entry WHERE key = ?', keys
+            )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache_entry')
+
+    def _overflow(self, connection):
+        """Число записей, если кэш вышел за пределы, иначе 0."""
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats'
+        ).fetchone()
+        too_big = self._max_size is not None and size > self._max_size
+        return entries if entries > self._max_entries or too_big else 0
+
+    def _cull(self, connection):
+        if not self._overflow(connection):
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?', (time.time(),)
+        )
+        entries = self._overflow(connection)
+        while entries:
+            if not self._cull_frequency:
+                connection.execute('DELETE FROM cache_entry')
+                return
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),),
+            )
+            entries = self._overflow(connection)
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class _LocalStore:
+    """LRU-словарь процесса с ограничением по числу записей и байтам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generation = None
+        self.check_after = 0.0
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, data = entry
+        if expires <= now:
+            self.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return data
+
+    def put(self, key, data, expires, max_entries, max_size):
+        self.pop(key)
+        if len(data) > max_size:
+            return
+        self.entries[key] = (expires, data)
+        self.size += len(data)
+        while len(self.entries) > max_entries or self.size > max_size:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _mark_stores_for_check(**kwargs):
+    # Версию поколения достаточно сверить один раз за запрос.
+    for store in list(_stores.values()):
+        store.check_after = 0.0
+
+
+request_started.connect(_mark_stores_for_check)
+
+
+def shared_cache():
+    """Общий уровень кэша default (сам default, если он одноуровневый)."""
+    return getattr(cache, 'shared', cache)
+
+
+class TieredCache(BaseCache):
+    """
+    L1 в памяти процесса перед общим кэшем (L2).
+
+    Попадание в L1 не ходит в общий кэш. Записи идут в оба уровня,
+    но delete() и перезапись в другом воркере до L1 соседей не доходят:
+    запись там живёт до L1_TIMEOUT. Поэтому через этот кэш хранится то,
+    что проверяется по версиям (страницы, фрагменты, счётчики), а сами
+    версии и данные, которые меняются на месте, — в shared_cache().
+    Полный сброс (clear()) доходит до остальных процессов через
+    счётчик поколения в L2: они сверяют его в начале каждого запроса
+    (и не реже раза в GENERATION_CHECK секунд) и очищают свой L1.
+
+    Настройки (OPTIONS):
+        SHARED_ALIAS — псевдоним общего кэша в CACHES (по умолчанию shared);
+        MAX_ENTRIES, MAX_SIZE — пределы L1 по записям и байтам;
+        L1_TIMEOUT — сколько секунд запись может жить в L1.
+    """
+    GENERATION_KEY = 'tiered:generation'
+    GENERATION_CHECK = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._max_size = int(options.get('MAX_SIZE', 32 * 1024 * 1024))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 60))
+        with _stores_lock:
+            self._store = _stores.setdefault(location, _LocalStore())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _sync(self, now):
+        store = self._store
+        if now < store.check_after:
+            return
+        generation = self.shared.get(self.GENERATION_KEY)
+        with store.lock:
+            if generation != store.generation:
+                store.clear()
+                store.generation = generation
+            store.check_after = now + self.GENERATION_CHECK
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        expires = time.time() + self._l1_timeout
+        backend_timeout = self.get_backend_timeout(timeout)
+        if backend_timeout is not None:
+            expires = min(expires, backend_timeout)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._store.put(
+                key, data, expires, self._max_entries, self._max_size
+            )
+
+    def _forget(self, *keys):
+        with self._store.lock:
+            for key in keys:
+                self._store.pop(key)
+
+    def invalidate(self):
+        """Очищает L1 во всех процессах, начиная со своего."""
+        try:
+            self.shared.incr(self.GENERATION_KEY)
+        except ValueError:
+            self.shared.set(self.GENERATION_KEY, int(time.time()), None)
+        with self._store.lock:
+            self._store.clear()
+            self._store.check_after = 0.0
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        now = time.time()
+        self._sync(now)
+        found, missing = {}, {}
+        with self._store.lock:
+            for key in keys:
+                full_key = self._key(key, version)
+                data = self._store.get(full_key, now)
+                if data is None:
+                    missing[full_key] = key
+                else:
+                    found[key] = data
+        found = {key: pickle.loads(data) for key, data in found.items()}
+        instrumentation.count_cache('l1 hit', len(found))
+        if missing:
+            fetched = self.shared.get_many(list(missing), version=0)
+            for full_key, value in fetched.items():
+                self._remember(full_key, value)
+                found[missing[full_key]] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self.shared.set(key, value, self._shared_timeout(timeout), version=0)
+        self._remember(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        added = self.shared.add(
+            key, value, self._shared_timeout(timeout), version=0
+        )
+        if added:
+            self._remember(key, value, timeout)
+        else:
+            self._forget(key)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        self._forget(key)
+        return self.shared.incr(key, delta, version=0)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._forget(key)
+        return self.shared.touch(key, self._shared_timeout(timeout), version=0)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        self._forget(*keys)
+        self.shared.delete_many(keys, version=0)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self.shared.clear()
+        self.invalidate()
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
@@ -0,0 +1,269 @@
+"""
+Замеры запросов: база, шаблоны, кэш и общее время.
+
+Middleware заводит на запрос объект Record и делает его текущим;
+обёртка execute_wrapper соединений с базой, обёртка рендера шаблонов
+и бэкенды кэша из core.cache_backends пишут в него свои замеры.
+Итог уходит в заголовок Server-Timing и в скользящее окно последних
+запросов по имени URL. Окно живёт в памяти процесса и раз в
+FLUSH_INTERVAL секунд копируется в общий кэш, откуда отчёт собирает
+данные всех воркеров.
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from . import cache_backends
+
+FLUSH_INTERVAL: int = 10  # как часто процесс выкладывает окно в кэш, с
+SNAPSHOT_TIMEOUT: int = 60 * 60  # снимок умершего воркера живёт час
+SLOTS_KEY: str = 'instrumentation:slots'
+SNAPSHOT_KEY: str = 'instrumentation:slot:{slot}'
+SIMILAR_QUERIES: int = 3  # столько одинаковых SQL за запрос — похоже на N+1
+PERCENTILES = (50, 95, 99)
+
+_current = ContextVar('instrumentation_record', default=None)
+
+
+class Record:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.queries = Counter()
+        self.statements = Counter()
+        self.cache = Counter()
+
+    def query_count(self):
+        return sum(self.statements.values())
+
+    def duplicates(self):
+        """SQL, выполненные повторно с теми же или похожими параметрами."""
+        exact = {sql for (sql, _), count in self.queries.items() if count > 1}
+        similar = {
+            sql for sql, count in self.statements.items()
+            if count >= SIMILAR_QUERIES
+        }
+        return sorted(exact | similar)
+
+    def server_timing(self):
+        cache_desc = ', '.join(
+            f'{name} {count}' for name, count in sorted(self.cache.items())
+        )
+        parts = [
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.query_count()} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ]
+        if cache_desc:
+            parts.insert(2, f'cache;desc="{cache_desc}"')
+        return ', '.join(parts)
+
+
+def start():
+    record = Record()
+    return record, _current.set(record)
+
+
+def finish(record, token):
+    record.total = time.perf_counter() - record.started
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: время и текст каждого SQL."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.db_time += time.perf_counter() - started
+        record.statements[sql] += 1
+        record.queries[(sql, repr(params))] += 1
+
+
+def count_cache(kind, count=1):
+    """Учитывает попадания и промахи кэша: kind вида 'l1 hit'."""
+    record = _current.get()
+    if record is not None and count:
+        record.cache[kind] += count
+
+
+def install_template_timer():
+    """Оборачивает рендер шаблонов Django замером времени (один раз)."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            record.template_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+class Window:
+    """Последние замеры по именам URL в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(self._new_samples)
+        self.duplicates = defaultdict(Counter)
+        self.slot = None
+        self.flushed = 0.0
+
+    @staticmethod
+    def _new_samples():
+        return deque(maxlen=getattr(settings, 'INSTRUMENTATION_WINDOW', 1000))
+
+    def add(self, name, record):
+        sample = (
+            record.total * 1000,
+            record.db_time * 1000,
+            record.query_count(),
+            record.template_time * 1000,
+        )
+        with self.lock:
+            self.samples[name].append(sample)
+            for sql in record.duplicates():
+                self.duplicates[name][sql] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'samples': {
+                    name: list(samples)
+                    for name, samples in self.samples.items()
+                },
+                'duplicates': {
+                    name: dict(counter.most_common(10))
+                    for name, counter in self.duplicates.items()
+                },
+            }
+
+    def flush(self, force=False):
+        """Копирует окно в общий кэш не чаще раза в FLUSH_INTERVAL."""
+        now = time.monotonic()
+        if not force and now - self.flushed < FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        shared = cache_backends.shared_cache()
+        slots = shared.get(SLOTS_KEY)
+        # После очистки кэша счётчик слотов начинается заново: свой
+        # слот тоже получаем заново, иначе отчёт его не увидит.
+        if self.slot is None or slots is None or slots < self.slot:
+            try:
+                self.slot = shared.incr(SLOTS_KEY)
+            except ValueError:
+                shared.add(SLOTS_KEY, 0, None)
+                self.slot = shared.incr(SLOTS_KEY)
+        shared.set(
+            SNAPSHOT_KEY.format(slot=self.slot), self.snapshot(),
+            SNAPSHOT_TIMEOUT,
+        )
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.duplicates.clear()
+
+
+window = Window()
+
+
+def _percentile(values, percent):
+    # Метод ближайшего ранга по отсортированному списку.
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def collect():
+    """Окна всех воркеров из кэша плюс свежее окно этого процесса."""
+    shared = cache_backends.shared_cache()
+    slots = shared.get(SLOTS_KEY) or 0
+    snapshots = shared.get_many([
+        SNAPSHOT_KEY.format(slot=slot) for slot in range(1, slots + 1)
+    ])
+    own = window.snapshot()
+    snapshots = [
+        snapshot for snapshot in snapshots.values()
+        if snapshot['pid'] != own['pid']
+    ] + [own]
+    samples = defaultdict(list)
+    duplicates = defaultdict(Counter)
+    for snapshot in snapshots:
+        for name, values in snapshot['samples'].items():
+            samples[name].extend(values)
+        for name, counter in snapshot['duplicates'].items():
+            duplicates[name].update(counter)
+    return samples, duplicates
+
+
+def report():
+    """
+    Сводка по именам URL: число запросов, перцентили общего времени,
+    медианы времени базы, числа SQL и рендера, повторяющиеся SQL.
+    """
+    samples, duplicates = collect()
+    rows = []
+    for name in sorted(samples):
+        values = samples[name]
+        totals = sorted(value[0] for value in values)
+        median = len(values) // 2
+        rows.append({
+            'name': name,
+            'requests': len(values),
+            'percentiles': [
+                (percent, _percentile(totals, percent))
+                for percent in PERCENTILES
+            ],
+            'db': sorted(value[1] for value in values)[median],
+            'queries': sorted(value[2] for value in values)[median],
+            'template': sorted(value[3] for value in values)[median],
+            'duplicates': duplicates[name].most_common(5),
+        })
+    return rows
+
+
+def format_report(rows):
+    """Текстовая таблица отчёта для консоли."""
+    header = (
+        f'{"URL":<28} {"n":>6} '
+        + ' '.join(f'{f"p{percent}":>8}' for percent in PERCENTILES)
+        + f' {"db":>8} {"sql":>5} {"tpl":>8}'
+    )
+    lines = [header]
+    for row in rows:
+        lines.append(
+            f'{row["name"]:<28} {row["requests"]:>6} '
+            + ' '.join(f'{value:>8.1f}' for _, value in row['percentiles'])
+            + f' {row["db"]:>8.1f} {row["queries"]:>5} '
+            f'{row["template"]:>8.1f}'
+        )
+        for sql, count in row['duplicates']:
+            lines.append(f'    повтор SQL в {count} запросах: {sql[:100]}')
+    return '\n'.join(lines)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import instrumentation
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает p50/p95/p99 времени ответа по именам URL и повторяющиеся '
+        'SQL по замерам всех воркеров.'
+    )
+
+    def handle(self, *args, **options):
+        rows = instrumentation.report()
+        if not rows:
+            self.stdout.write('Замеров пока нет')
+            return
+        self.stdout.write(instrumentation.format_report(rows))
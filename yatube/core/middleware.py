@@ -0,0 +1,52 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import instrumentation
+
+
+class InstrumentationMiddleware:
+    """
+    Замеряет каждый запрос и отдаёт итог в заголовке Server-Timing.
+
+    Включается настройкой INSTRUMENTATION_ENABLED; ставится первой
+    в MIDDLEWARE, чтобы общее время покрывало остальные middleware.
+    Для потоковых ответов время считается до возврата из view.
+    Замеры идут в отчёт по всем запросам, а заголовок с ними видят
+    только персонал и адреса из INTERNAL_IPS: остальным он выдал бы
+    устройство сайта и попадания в кэш.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumentation.install_template_timer()
+
+    def __call__(self, request):
+        record, token = instrumentation.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        instrumentation.execute_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            instrumentation.finish(record, token)
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match else 'unresolved'
+        if self.shows_timing(request):
+            response['Server-Timing'] = record.server_timing()
+        instrumentation.window.add(name, record)
+        instrumentation.window.flush()
+        return response
+
+    @staticmethod
+    def shows_timing(request):
+        if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
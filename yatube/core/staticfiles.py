@@ -0,0 +1,264 @@
+"""
+Статика с хэшами в именах, заранее сжатая и отдаваемая из WSGI.
+
+manage.py collectstatic через CompressedManifestStorage кладёт в
+STATIC_ROOT копии файлов с хэшем содержимого в имени
+(bootstrap.min.3f2a1c.css), манифест staticfiles.json и рядом с каждым
+текстовым файлом его .gz и, если установлен пакет brotli, .br. Сжатие
+делается один раз при сборке с максимальной степенью, а не на каждый
+запрос.
+
+StaticFilesApp оборачивает WSGI-приложение Django (yatube/wsgi.py):
+при старте процесса он обходит STATIC_ROOT и строит таблицу
+URL → файл, а запросы к STATIC_URL обслуживает сам, не доходя до
+middleware и urlconf. Ответ — вариант, который принимает клиент
+(Accept-Encoding: br, затем gzip), с ETag, Vary: Accept-Encoding и,
+для имён с хэшем, Cache-Control на год с immutable: новое содержимое
+получит новое имя.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # .br не строятся, отдаётся gzip
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.html',
+    '.ico',
+)
+MIN_SIZE: int = 512  # меньшие файлы не сжимаются: выигрыш меньше пакета
+MIN_RATIO: float = 0.95  # сжатое больше 95% исходного не сохраняется
+IMMUTABLE_MAX_AGE: int = 60 * 60 * 24 * 365  # год для имён с хэшем
+MAX_AGE: int = 60  # прочие файлы (без хэша) перепроверяются чаще
+CHUNK_SIZE: int = 64 * 1024
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # в порядке предпочтения
+
+
+def compress(data):
+    """Сжатые варианты data: {расширение: байты}, только выгодные."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {
+        suffix: compressed for suffix, compressed in variants.items()
+        if len(compressed) < len(data) * MIN_RATIO
+    }
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage, который после хэширования сжимает файлы.
+
+    Без собранной статики (разработка, тесты) url() отдаёт имя без хэша,
+    а не падает на отсутствующей записи манифеста.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # CSS хэшируются в несколько проходов: сжимаются итоговые имена.
+        for name in paths:
+            hashed_name = self.hashed_files.get(
+                self.hash_key(self.clean_name(name))
+            )
+            for target in {name, hashed_name} - {None}:
+                self.compress_file(target)
+
+    def compress_file(self, name):
+        """Пишет .gz и .br рядом с name; True, если что-то записано."""
+        if not name.lower().endswith(COMPRESSIBLE):
+            return False
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_SIZE:
+            return False
+        variants = compress(data)
+        for suffix, compressed in variants.items():
+            path = self.path(name + suffix)
+            with open(path, 'wb') as target:
+                target.write(compressed)
+        return bool(variants)
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return FileSystemStorage.url(self, name)
+
+
+class StaticFile:
+    """Файл статики и его сжатые варианты, готовые заголовки ответа."""
+
+    def __init__(self, path, immutable):
+        self.variants = {None: path}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = path + suffix
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        if content_type and content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        max_age = IMMUTABLE_MAX_AGE if immutable else MAX_AGE
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            (
+                'Cache-Control',
+                f'public, max-age={max_age}'
+                + (', immutable' if immutable else ''),
+            ),
+        ]
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+        self.etag = '"{}"'.format(hashlib.blake2b(
+            f'{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode(),
+            digest_size=8,
+        ).hexdigest())
+
+    def choose(self, accept_encoding):
+        """
+        Кодировка ответа по заголовку Accept-Encoding клиента.
+
+        Берётся вариант с наибольшим q, при равных — по порядку
+        ENCODINGS; q=0 (в любой записи: 0.0, 0.000) означает отказ.
+        """
+        accepted = _qualities(accept_encoding)
+        wildcard = accepted.get('*', 0)
+        chosen, best = None, 0
+        for encoding, _ in ENCODINGS:
+            if encoding not in self.variants:
+                continue
+            quality = accepted.get(encoding, wildcard)
+            if quality > best:
+                chosen, best = encoding, quality
+        return chosen
+
+    def matches(self, encoding, if_none_match):
+        """
+        Совпадает ли ETag варианта с If-None-Match.
+
+        Сравнение слабое, как требует RFC 7232 для If-None-Match: W/
+        не учитывается, «*» совпадает с любым существующим файлом.
+        """
+        etags = parse_etags(if_none_match)
+        if '*' in etags:
+            return True
+        etag = self.etag_for(encoding)
+        return any(
+            (tag[2:] if tag.startswith('W/') else tag) == etag
+            for tag in etags
+        )
+
+    def etag_for(self, encoding):
+        # У каждого варианта свой ETag: байты ответа различаются.
+        return self.etag if encoding is None else (
+            f'{self.etag[:-1]}-{encoding}"'
+        )
+
+
+def _qualities(accept_encoding):
+    """{кодировка: q} из Accept-Encoding; нечитаемый q считается нулём."""
+    qualities = {}
+    for part in accept_encoding.split(','):
+        name, *params = part.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities
+
+
+def _hashed_names(root):
+    """Имена из манифеста collectstatic, у которых в имени есть хэш."""
+    storage = ManifestStaticFilesStorage(location=root)
+    return set(storage.load_manifest().values())
+
+
+def _index(root):
+    immutable = _hashed_names(root)
+    files = {}
+    compressed = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, names in os.walk(root):
+        for filename in names:
+            if filename.endswith(compressed):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(path, name in immutable)
+    return files
+
+
+class StaticFilesApp:
+    """
+    WSGI-обёртка, отдающая собранную статику мимо Django.
+
+    Таблица файлов строится один раз при импорте wsgi.py; файлы,
+    собранные после старта процесса, увидит только следующий запуск.
+    """
+
+    def __init__(self, application, root, prefix):
+        self.application = application
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.files = _index(root) if root and os.path.isdir(root) else {}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        static_file = self.files.get(
+            posixpath.normpath(path[len(self.prefix):])
+        )
+        if static_file is None:
+            return self.application(environ, start_response)
+        return self.serve(static_file, environ, start_response)
+
+    def serve(self, static_file, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return [b'']
+        encoding = static_file.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        etag = static_file.etag_for(encoding)
+        headers = static_file.headers + [('ETag', etag)]
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH', '')
+        if static_file.matches(encoding, if_none_match):
+            start_response('304 Not Modified', [
+                header for header in headers if header[0] != 'Content-Type'
+            ])
+            return [b'']
+        path = static_file.variants[encoding]
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(os.path.getsize(path))))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return [b'']
+        source = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(source, CHUNK_SIZE)
+        return _chunks(source)
+
+
+def _chunks(source):
+    with source:
+        yield from iter(lambda: source.read(CHUNK_SIZE), b'')
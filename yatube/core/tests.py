@@ -0,0 +1,376 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from multiprocessing import Pool
+
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import instrumentation
+from core.cache_backends import SQLiteCache, TieredCache, shared_cache
+from core.staticfiles import IMMUTABLE_MAX_AGE, StaticFilesApp
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+
+def _cache(**options):
+    return SQLiteCache(
+        f'{TEMP_CACHE_DIR}/cache.sqlite3',
+        {'OPTIONS': options, 'TIMEOUT': 60},
+    )
+
+
+def _incr_many(times):
+    cache = _cache()
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = _cache(MAX_ENTRIES=1000)
+        self.cache.clear()
+
+    def test_basic_operations(self):
+        """get/set/add/delete/get_many работают как у бэкендов Django."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 'два'}
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.has_key('new'))
+
+    def test_expired_entries_are_invisible(self):
+        """Просроченные записи не отдаются и могут быть перезаписаны add."""
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'fresh'))
+
+    def test_incr(self):
+        """incr атомарен, в том числе из нескольких процессов."""
+        self.cache.set('counter', 0, timeout=None)
+        with Pool(4) as pool:
+            pool.map(_incr_many, [50] * 4)
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.incr('counter', 10), 210)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_by_entries_and_size(self):
+        """Переполнение вытесняет записи, которые дольше всех не читали."""
+        cache = _cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        connection = cache._connection()
+        connection.execute(
+            'UPDATE cache_entry SET accessed = accessed - 100 '
+            "WHERE key != ':1:key0'"
+        )
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+        sized = _cache(MAX_SIZE=2000)
+        sized.clear()
+        for i in range(10):
+            sized.set(f'blob{i}', b'x' * 500)
+        entries, size = sized._connection().execute(
+            'SELECT entries, bytes FROM cache_stats'
+        ).fetchone()
+        self.assertLessEqual(size, 2000)
+        self.assertIsNotNone(sized.get('blob9'))
+
+
+def _tiered(location, **options):
+    return TieredCache(location, {'OPTIONS': options, 'TIMEOUT': 60})
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': f'{TEMP_CACHE_DIR}/shared.sqlite3',
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два экземпляра с разными L1 ведут себя как два воркера.
+        self.worker = _tiered('worker-1')
+        self.other = _tiered('worker-2')
+        self.worker.invalidate()
+        request_started.send(sender=None)
+
+    def test_l1_hit_skips_shared_cache(self):
+        """Повторное чтение обслуживается памятью процесса."""
+        self.worker.set('key', {'value': 1})
+        with mock.patch.object(
+            SQLiteCache, 'get_many', side_effect=AssertionError
+        ):
+            self.assertEqual(self.worker.get('key'), {'value': 1})
+        self.assertEqual(self.other.get('key'), {'value': 1})
+        self.assertEqual(self.other.get_many(['key', 'missing']), {
+            'key': {'value': 1}
+        })
+
+    def test_invalidate_reaches_other_workers(self):
+        """invalidate() в одном воркере очищает L1 остальных."""
+        self.worker.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.worker.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.worker.invalidate()
+        request_started.send(sender=None)
+        self.assertEqual(self.other.get('key'), 'new')
+
+    def test_incr_and_delete_go_to_shared_cache(self):
+        """incr и delete не оставляют в L1 устаревших значений."""
+        self.worker.set('counter', 1)
+        self.assertEqual(self.worker.incr('counter'), 2)
+        self.assertEqual(self.worker.get('counter'), 2)
+        self.worker.delete('counter')
+        self.assertIsNone(self.worker.get('counter'))
+        self.assertFalse(self.worker.has_key('counter'))
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные записи по числу и объёму."""
+        cache = _tiered('bounded', MAX_ENTRIES=3, MAX_SIZE=10_000)
+        for i in range(5):
+            cache.set(f'key{i}', b'x' * 100)
+        store = cache._store
+        self.assertEqual(len(store.entries), 3)
+        cache.set('big', b'x' * 20_000)
+        self.assertNotIn(cache.make_key('big'), store.entries)
+        self.assertEqual(cache.get('big'), b'x' * 20_000)
+        self.assertLessEqual(store.size, 10_000)
+
+
+class TestSettingsTests(SimpleTestCase):
+    def test_tests_use_memory_shared_cache(self):
+        """Тесты не пишут в файл кэша проекта, общий с сервером."""
+        self.assertNotIsInstance(caches['shared'], SQLiteCache)
+        self.assertNotIn(settings.BASE_DIR, str(
+            settings.CACHES['shared'].get('LOCATION')
+        ))
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.window.clear()
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ несёт Server-Timing с базой, шаблонами, кэшем и итогом."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertIn('page miss', timing)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('page hit', response['Server-Timing'])
+        samples, _ = instrumentation.collect()
+        self.assertEqual(len(samples['posts:index']), 2)
+
+    def test_server_timing_is_internal_only(self):
+        """Внешним посетителям заголовок не отдаётся, персоналу — да."""
+        url = reverse('posts:index')
+        external = {'REMOTE_ADDR': '203.0.113.7'}
+        self.assertFalse(
+            self.client.get(url, **external).has_header('Server-Timing')
+        )
+        user = get_user_model().objects.create_user(username='staff')
+        self.client.force_login(user)
+        self.assertFalse(
+            self.client.get(url, **external).has_header('Server-Timing')
+        )
+        user.is_staff = True
+        user.save()
+        self.assertTrue(
+            self.client.get(url, **external).has_header('Server-Timing')
+        )
+
+    def test_duplicate_queries_are_flagged(self):
+        """Повтор SQL с теми же параметрами и серия похожих — дубликаты."""
+        record, token = instrumentation.start()
+        try:
+            for params in ((1,), (1,), (2,)):
+                instrumentation.execute_wrapper(
+                    lambda *args: None, 'SELECT %s', params, False, {}
+                )
+            instrumentation.execute_wrapper(
+                lambda *args: None, 'SELECT 1', (), False, {}
+            )
+        finally:
+            instrumentation.finish(record, token)
+        self.assertEqual(record.query_count(), 4)
+        self.assertEqual(record.duplicates(), ['SELECT %s'])
+
+    def test_report_is_staff_only(self):
+        """Отчёт видит только персонал; команда печатает перцентили."""
+        self.client.get(reverse('posts:index'))
+        user = get_user_model().objects.create_user(username='staff')
+        self.client.force_login(user)
+        response = self.client.get(reverse('instrumentation'))
+        self.assertEqual(response.status_code, 302)
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('instrumentation'))
+        self.assertContains(response, 'posts:index')
+        # Снимок в кэше, записанный «другим воркером».
+        instrumentation.window.flush(force=True)
+        key = instrumentation.SNAPSHOT_KEY.format(
+            slot=instrumentation.window.slot
+        )
+        snapshot = shared_cache().get(key)
+        snapshot['pid'] = -1
+        shared_cache().set(key, snapshot)
+        instrumentation.window.clear()
+        stdout = StringIO()
+        call_command('instrumentation_report', stdout=stdout)
+        self.assertIn('p95', stdout.getvalue())
+        self.assertIn('posts:index', stdout.getvalue())
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic с хэшами и сжатием, отдача из WSGI-обёртки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        cls.css = b'body { color: #333; }\n' * 100
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'wb') as f:
+            f.write(cls.css)
+        with open(os.path.join(cls.source, 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(range(256)) * 4)
+        with override_settings(
+            STATICFILES_DIRS=[cls.source], STATIC_ROOT=cls.root
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        cls.app = StaticFilesApp(cls.fallback, cls.root, '/static/')
+        cls.hashed = next(
+            name for name in cls.app.files
+            if name.startswith('css/site.') and name != 'css/site.css'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    @staticmethod
+    def fallback(environ, start_response):
+        start_response('200 OK', [('X-Django', '1')])
+        return [b'django']
+
+    def get(self, path, **headers):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+        environ.update(headers)
+        response = {}
+
+        def start_response(status, response_headers):
+            response['status'] = status
+            response['headers'] = dict(response_headers)
+
+        response['body'] = b''.join(self.app(environ, start_response))
+        return response
+
+    def test_collectstatic_writes_compressed_variants(self):
+        gz = os.path.join(self.root, self.hashed + '.gz')
+        with open(gz, 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.css)
+        # PNG уже сжат: вариантов нет.
+        self.assertFalse(any(
+            name.endswith('.png.gz') for name in os.listdir(self.root)
+        ))
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        response = self.get(
+            '/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        headers = response['headers']
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn(f'max-age={IMMUTABLE_MAX_AGE}', headers['Cache-Control'])
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(response['body']), self.css)
+        plain = self.get('/static/' + self.hashed)
+        self.assertNotIn('Content-Encoding', plain['headers'])
+        self.assertEqual(plain['body'], self.css)
+        self.assertNotEqual(plain['headers']['ETag'], headers['ETag'])
+
+    def test_etag_revalidation(self):
+        etag = self.get('/static/logo.png')['headers']['ETag']
+        response = self.get('/static/logo.png', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(response['body'], b'')
+
+    def test_accept_encoding_quality(self):
+        """Отказ q=0 в любой записи, выбор по наибольшему q и «*»."""
+        cases = {
+            'gzip;q=0': None,
+            'gzip;q=0.0': None,
+            'gzip; q=0.000, deflate': None,
+            'gzip;q=bad': None,
+            'gzip;q=0.5, identity': 'gzip',
+            'GZIP': 'gzip',
+            '*;q=0.1': 'gzip',
+            '*, gzip;q=0': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                headers = self.get(
+                    '/static/' + self.hashed, HTTP_ACCEPT_ENCODING=header
+                )['headers']
+                self.assertEqual(headers.get('Content-Encoding'), expected)
+
+    def test_if_none_match_list(self):
+        """If-None-Match разбирается как список ETag, с «*» и W/."""
+        etag = self.get('/static/logo.png')['headers']['ETag']
+        cases = {
+            f'"other", {etag}': '304 Not Modified',
+            f'W/{etag}': '304 Not Modified',
+            '*': '304 Not Modified',
+            f'"other-{etag[1:-1]}-x"': '200 OK',
+            f'{etag[:-1]}x"': '200 OK',
+            '"other"': '200 OK',
+        }
+        for header, status in cases.items():
+            with self.subTest(header=header):
+                response = self.get(
+                    '/static/logo.png', HTTP_IF_NONE_MATCH=header
+                )
+                self.assertEqual(response['status'], status)
+
+    def test_other_paths_go_to_django(self):
+        for path in ('/', '/static/missing.css', '/static/../settings.py'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)['body'], b'django')
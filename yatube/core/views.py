@@ -1,12 +1,23 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import instrumentation
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    match = request.resolver_match
+    if match is not None and match.namespace == 'api':
+        # Клиенту API нужен ответ в его формате, а не HTML-страница.
+        return JsonResponse(
+            {'detail': f'Ошибка CSRF: {reason}'}, status=403,
+            json_dumps_params={'ensure_ascii': False},
+        )
+    return render(request, 'core/403csrf.html', status=403)
 
 
 def server_error(request):
@@ -15,3 +26,11 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def instrumentation_report(request):
+    return render(request, 'core/instrumentation.html', {
+        'rows': instrumentation.report(),
+        'percentiles': instrumentation.PERCENTILES,
+    })
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 from .models import Group, Post, Comment, Follow
+from . import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +11,17 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if not search.build_match(search_term):
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=RawSQL(*search.matching_ids_sql(search_term))
+        ), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Пост'
     verbose_name_plural = 'Посты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
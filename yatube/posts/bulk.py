@@ -0,0 +1,67 @@
+"""
+Массовая запись постов мимо сигналов модели.
+
+bulk_create не вызывает post_save, поэтому всё, что для одиночного
+поста делают сигналы (счётчики, ленты подписчиков, поисковый индекс,
+версии кэша), здесь выполняется одним пакетом на диапазон id.
+"""
+from contextlib import contextmanager
+
+from django.db.models import Count, Max
+
+from . import caching, counters, search, timeline
+from .models import Group, Post
+
+EXPORT_FIELDS = (
+    'pk', 'pub_date', 'author__username', 'group__slug', 'text', 'image',
+)
+EXPORT_COLUMNS = ('id', 'pub_date', 'author', 'group', 'text', 'image')
+
+
+@contextmanager
+def explicit_pub_date():
+    """
+    Отключает auto_now_add у Post.pub_date, чтобы сохранить даты из файла.
+
+    Флаг поля общий для процесса, поэтому пригоден только для команд.
+    """
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def insert_posts(posts):
+    """
+    Вставляет пачку постов и выполняет за них работу сигналов.
+
+    Вызывать внутри транзакции: на SQLite id новых строк вычисляются
+    по максимальному id после вставки, и пачка получает их подряд,
+    пока транзакция держит блокировку записи.
+    """
+    if not posts:
+        return
+    Post.objects.bulk_create(posts)
+    if posts[0].pk is not None:
+        first_pk, last_pk = posts[0].pk, posts[-1].pk
+    else:
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last']
+        first_pk = last_pk - len(posts) + 1
+    after_insert(first_pk, last_pk)
+
+
+def after_insert(first_pk, last_pk):
+    imported = Post.objects.filter(pk__range=(first_pk, last_pk)).order_by()
+    for author_id, total in imported.values_list('author').annotate(
+        total=Count('pk')
+    ):
+        counters.change_user(author_id, 'posts_count', total)
+    for group_id, total in imported.exclude(group=None).values_list(
+        'group'
+    ).annotate(total=Count('pk')):
+        counters.change(Group, group_id, 'posts_count', total)
+    timeline.fan_out_range(first_pk, last_pk)
+    search.index_range(first_pk, last_pk)
+    caching.bump('posts', 'groups', 'group_counts')
@@ -0,0 +1,148 @@
+"""
+Кэш готовых страниц для анонимных посетителей.
+
+Каждая страница зависит от набора тегов («posts», «group:<slug>»,
+«post:<id>»…), у каждого тега в кэше лежит номер версии. В записи
+страницы хранятся версии её тегов на момент рендера; при чтении они
+сверяются с текущими, и если сигнал модели успел поднять версию хотя бы
+одного тега, страница рендерится заново. Поэтому TTL может быть долгим,
+а устаревшая страница не отдаётся.
+
+Версии читаются в depends_on(), до чтения данных: если тег поднимут,
+пока view работает, запись окажется со старыми версиями и не будет
+отдана. Внутри транзакции bump() поднимает версии сразу и ещё раз
+после коммита (now_and_after_commit).
+
+Версии и времена изменения тегов хранятся только в общем уровне кэша
+(core.cache_backends.shared_cache): bump() в одном воркере сразу виден
+остальным, а записи страниц в L1 воркеров проверяются по этим версиям
+и сбрасывать L1 не нужно.
+"""
+import time
+from functools import partial, wraps
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core import instrumentation
+from core.cache_backends import shared_cache
+
+PAGE_CACHE_TIMEOUT: int = 60 * 60 * 24  # сутки: инвалидация по версиям
+PAGE_KEY: str = 'page:{path}?{query}'
+VERSION_KEY: str = 'version:{tag}'
+MODIFIED_KEY: str = 'modified:{tag}'
+
+
+def _initial_version():
+    # Версия, созданная заново после вытеснения ключа, не должна совпасть
+    # со старой, поэтому начинаем с текущего времени, а не с единицы.
+    return int(time.time() * 1000)
+
+
+def versions(tags):
+    """Текущие версии тегов одним запросом к кэшу."""
+    tags_cache = shared_cache()
+    keys = [VERSION_KEY.format(tag=tag) for tag in tags]
+    found = tags_cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            tags_cache.add(key, value, None)
+        found.update(tags_cache.get_many(list(missing)))
+    return tuple(found.get(key) for key in keys)
+
+
+def last_modified(tags):
+    """Время последнего изменения тегов (unix time), одним запросом."""
+    tags_cache = shared_cache()
+    keys = [MODIFIED_KEY.format(tag=tag) for tag in tags]
+    found = tags_cache.get_many(keys)
+    now = int(time.time())
+    for key in keys:
+        if key not in found:
+            # Время изменения неизвестно (ключ вытеснен): считаем, что сейчас.
+            tags_cache.add(key, now, None)
+            found[key] = now
+    return max(found.values(), default=now)
+
+
+def now_and_after_commit(func):
+    """
+    Сбрасывает кэш вызовом func сразу, а внутри транзакции и после коммита.
+
+    До коммита параллельный запрос ещё читает старые данные и может
+    снова положить их в кэш — уже под новыми версиями или на место
+    удалённого ключа. Повтор после коммита убирает такую запись.
+    """
+    func()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+def bump(*tags):
+    """Поднимает версии тегов, делая зависящие от них страницы старыми."""
+    now_and_after_commit(partial(_bump, tags))
+
+
+def _bump(tags):
+    tags_cache = shared_cache()
+    now = int(time.time())
+    tags_cache.set_many(
+        {MODIFIED_KEY.format(tag=tag): now for tag in tags}, None
+    )
+    for tag in tags:
+        key = VERSION_KEY.format(tag=tag)
+        try:
+            tags_cache.incr(key)
+        except ValueError:
+            tags_cache.set(key, _initial_version(), None)
+
+
+def depends_on(request, *tags):
+    """
+    Отмечает, от каких тегов зависит страница текущего запроса.
+
+    Версии запоминаются здесь, до чтения данных и рендера: с ними
+    страница и попадёт в кэш.
+    """
+    request.cache_tags = getattr(request, 'cache_tags', ()) + tags
+    request.cache_versions = (
+        getattr(request, 'cache_versions', ()) + versions(tags)
+    )
+
+
+def cache_anonymous_page(view=None, *, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Кэширует ответ view для анонимов с версионной инвалидацией.
+
+    timeout короче суток нужен страницам с данными, которые меняются
+    без подъёма версий (счётчики просмотров поста).
+    """
+    if view is None:
+        return partial(cache_anonymous_page, timeout=timeout)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        key = PAGE_KEY.format(
+            path=request.path, query=request.GET.urlencode()
+        )
+        entry = cache.get(key)
+        if entry is not None:
+            tags, stored_versions, response = entry
+            if versions(tags) == stored_versions:
+                instrumentation.count_cache('page hit')
+                return response
+        instrumentation.count_cache('page miss')
+        response = view(request, *args, **kwargs)
+        tags = getattr(request, 'cache_tags', ())
+        if response.status_code == 200 and tags:
+            cache.set(
+                key, (tags, request.cache_versions, response), timeout,
+            )
+        return response
+    return wrapper
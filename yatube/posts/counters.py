@@ -0,0 +1,180 @@
+"""
+Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 из сигналов
+моделей, поэтому рендер профиля и поста не делает агрегатных запросов.
+Расхождения (например, после ручных правок в БД) исправляет команда
+manage.py recount_counters.
+
+Числа строк для пагинаторов, у которых такого счётчика нет (общая
+лента, лента подписок), даёт count(): малые множества считаются точно
+и кэшируются до смены версий их тегов, а большие отдаются из кэша и
+пересчитываются в фоновом пуле не чаще COUNT_REFRESH секунд.
+"""
+import logging
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    Count, F, IntegerField, Max, Min, OuterRef, Subquery,
+)
+from django.db.models.functions import Coalesce
+
+from . import caching, thumbnails
+from .models import Comment, Follow, Group, Post, UserStats
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+EXACT_LIMIT: int = 10_000  # до стольких строк COUNT(*) делается сразу
+COUNT_REFRESH: int = 60  # как часто пересчитывать большие множества
+COUNT_TIMEOUT: int = 60 * 60 * 24  # сутки: инвалидация по версиям
+COUNT_KEY: str = 'count:{name}'
+COUNT_LOCK_KEY: str = 'count:{name}:refresh'
+
+
+def _not_below_zero(field, delta):
+    # Разошедшийся счётчик не должен уходить в минус и ронять запрос.
+    return {f'{field}__gte': -delta} if delta < 0 else {}
+
+
+def change(model, pk, field, delta):
+    """Сдвигает счётчик field у объекта model с первичным ключом pk."""
+    if pk is None:
+        return
+    model.objects.filter(pk=pk, **_not_below_zero(field, delta)).update(
+        **{field: F(field) + delta}
+    )
+
+
+def change_user(user_id, field, delta):
+    """Сдвигает счётчик пользователя, при необходимости создавая строку."""
+    updated = UserStats.objects.filter(
+        user_id=user_id, **_not_below_zero(field, delta)
+    ).update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        change(UserStats, user_id, field, delta)
+
+
+def user_stats(user):
+    """Счётчики пользователя; строку создаёт, если её ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(user=user)
+        return stats
+
+
+def _count(model, field, **filters):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}, **filters)
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile():
+    """Пересчитывает все счётчики пакетными UPDATE."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk)
+            for pk in User.objects.filter(stats__isnull=True)
+            .values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    caching.bump(
+        'posts', 'groups', 'users', 'comments', 'group_counts', 'celebrities'
+    )
+
+
+def estimate(queryset):
+    """
+    Оценка сверху по разбросу первичных ключей: два шага по индексу.
+
+    Удалённые строки оценку не уменьшают, поэтому она годится только
+    для решения, считать ли COUNT(*) сразу.
+    """
+    bounds = queryset.order_by().aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+    return bounds['last'] - bounds['first'] + 1
+
+
+def _store(name, value, tag_versions):
+    cache.set(
+        COUNT_KEY.format(name=name),
+        {
+            'value': value,
+            'versions': tag_versions,
+            'refreshed': time.time(),
+        },
+        COUNT_TIMEOUT,
+    )
+
+
+def _refresh_in_worker(name, queryset, tags):
+    try:
+        tag_versions = caching.versions(tags)
+        _store(name, queryset.count(), tag_versions)
+    except Exception:
+        logger.exception('Не удалось пересчитать %s', name)
+    finally:
+        connection.close()
+
+
+def _schedule_refresh(name, queryset, tags):
+    """Фоновый COUNT(*), не чаще COUNT_REFRESH на множество."""
+    if cache.add(COUNT_LOCK_KEY.format(name=name), True, COUNT_REFRESH):
+        transaction.on_commit(
+            lambda: thumbnails.get_executor().submit(
+                _refresh_in_worker, name, queryset, tags
+            )
+        )
+
+
+def count(name, queryset, tags=(), estimated=False):
+    """
+    Число строк queryset для пагинатора.
+
+    Пока оно не больше EXACT_LIMIT, оно точное и пересчитывается при
+    смене версии любого из tags. Большее число отдаётся из кэша как
+    есть, а пересчитывается в фоне. С estimated=True пустой кэш
+    заполняется оценкой estimate(), если она больше EXACT_LIMIT, —
+    так первый запрос к большой таблице обходится без COUNT(*).
+    """
+    tag_versions = caching.versions(tags)
+    entry = cache.get(COUNT_KEY.format(name=name))
+    if entry is not None:
+        if entry['versions'] == tag_versions:
+            return entry['value']
+        if entry['value'] > EXACT_LIMIT:
+            if time.time() - entry['refreshed'] > COUNT_REFRESH:
+                _schedule_refresh(name, queryset, tags)
+            return entry['value']
+    elif estimated:
+        value = estimate(queryset)
+        if value > EXACT_LIMIT:
+            _store(name, value, tag_versions)
+            _schedule_refresh(name, queryset, tags)
+            return value
+    value = queryset.count()
+    _store(name, value, tag_versions)
+    return value
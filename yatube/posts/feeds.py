@@ -0,0 +1,205 @@
+"""
+Ленты Atom, RSS и JSON Feed для главной, групп и авторов.
+
+Документ собирается генератором и отдаётся StreamingHttpResponse
+по мере чтения постов. ETag вычисляется по самому свежему посту
+ленты (один запрос по индексу pub_date), версиям её тегов кэша и
+адресу сайта, Last-Modified — по времени последнего изменения тегов.
+Готовое тело кэшируется под этим ETag, поэтому повторный опрос
+неизменившейся ленты стоит одного индексного запроса. Ссылки в теле
+абсолютные, поэтому в ключ входят схема и хост запроса.
+"""
+import hashlib
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from . import caching
+
+FEED_LENGTH: int = 20  # сколько последних постов попадает в ленту
+FEED_KEY: str = 'feed:{scheme}://{host}{path}:{etag}'
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+
+def _title(post):
+    return Truncator(post.text.splitlines()[0] if post.text else '').chars(
+        80
+    )
+
+
+def _author_name(post):
+    return post.author.get_full_name() or post.author.username
+
+
+def atom(feed, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+        f'<title>{escape(feed["title"])}</title>'
+        f'<link href={quoteattr(feed["home"])} rel="alternate"/>'
+        f'<link href={quoteattr(feed["url"])} rel="self"/>'
+        f'<id>{escape(feed["url"])}</id>'
+        f'<updated>{feed["updated"].isoformat()}</updated>'
+    )
+    for post in posts:
+        link = feed['link'](post)
+        group = (
+            f'<category term={quoteattr(post.group.slug)} '
+            f'label={quoteattr(post.group.title)}/>'
+            if post.group_id else ''
+        )
+        yield (
+            '<entry>'
+            f'<title>{escape(_title(post))}</title>'
+            f'<link href={quoteattr(link)} rel="alternate"/>'
+            f'<id>{escape(link)}</id>'
+            f'<published>{post.pub_date.isoformat()}</published>'
+            f'<updated>{post.pub_date.isoformat()}</updated>'
+            f'<author><name>{escape(_author_name(post))}</name></author>'
+            f'{group}'
+            f'<content type="text">{escape(post.text)}</content>'
+            '</entry>'
+        )
+    yield '</feed>\n'
+
+
+def rss(feed, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">'
+        '<channel>'
+        f'<title>{escape(feed["title"])}</title>'
+        f'<link>{escape(feed["home"])}</link>'
+        f'<description>{escape(feed["title"])}</description>'
+        f'<atom:link href={quoteattr(feed["url"])} rel="self"/>'
+        '<language>ru</language>'
+        f'<lastBuildDate>{http_date(feed["updated"].timestamp())}'
+        '</lastBuildDate>'
+    )
+    for post in posts:
+        link = feed['link'](post)
+        group = (
+            f'<category>{escape(post.group.title)}</category>'
+            if post.group_id else ''
+        )
+        yield (
+            '<item>'
+            f'<title>{escape(_title(post))}</title>'
+            f'<link>{escape(link)}</link>'
+            f'<guid isPermaLink="true">{escape(link)}</guid>'
+            f'<pubDate>{http_date(post.pub_date.timestamp())}</pubDate>'
+            f'<dc:creator xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'{escape(_author_name(post))}</dc:creator>'
+            f'{group}'
+            f'<description>{escape(post.text)}</description>'
+            '</item>'
+        )
+    yield '</channel></rss>\n'
+
+
+def json_feed(feed, posts):
+    head = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'home_page_url': feed['home'],
+        'feed_url': feed['url'],
+        'language': 'ru',
+    }, ensure_ascii=False)
+    # Шапка без закрывающей скобки: массив items дописывается по частям.
+    yield head[:-1] + ', "items": ['
+    for number, post in enumerate(posts):
+        link = feed['link'](post)
+        item = {
+            'id': link,
+            'url': link,
+            'title': _title(post),
+            'content_text': post.text,
+            'date_published': post.pub_date.isoformat(),
+            'authors': [{'name': _author_name(post)}],
+        }
+        if post.group_id:
+            item['tags'] = [post.group.title]
+        if post.image:
+            item['image'] = feed['absolute'](post.image.url)
+        yield (', ' if number else '') + json.dumps(item, ensure_ascii=False)
+    yield ']}\n'
+
+
+WRITERS = {'atom': atom, 'rss': rss, 'json': json_feed}
+
+
+def _cached_stream(chunks, key):
+    """Отдаёт куски документа и после последнего кладёт его в кэш."""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(body), caching.PAGE_CACHE_TIMEOUT)
+
+
+def respond(request, feed_format, posts, describe, tags):
+    """
+    Ответ с лентой в формате feed_format по queryset постов posts.
+
+    describe() возвращает (заголовок, адрес HTML-страницы) или бросает
+    Http404; вызывается только при сборке документа или пустой ленте,
+    чтобы проверка ETag обходилась одним запросом.
+    """
+    if feed_format not in WRITERS:
+        raise Http404('Неизвестный формат ленты')
+    posts = posts.order_by('-pub_date', '-pk')
+    newest = posts.values_list('pub_date', 'pk').first()
+    if newest is None:
+        describe()
+        newest = (None, None)
+    site = f'{request.scheme}://{request.get_host()}'
+    raw = f'{site}{request.path}|{newest}|{caching.versions(tags)}'
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    # Правка или удаление поста не меняют самый свежий pub_date,
+    # но поднимают время изменения тегов.
+    last_modified = max(
+        caching.last_modified(tags),
+        int(newest[0].timestamp()) if newest[0] else 0,
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        key = FEED_KEY.format(
+            scheme=request.scheme, host=request.get_host(),
+            path=request.path, etag=etag,
+        )
+        body = cache.get(key)
+        if body is not None:
+            response = HttpResponse(body)
+        else:
+            title, home = describe()
+            feed = {
+                'title': title,
+                'home': request.build_absolute_uri(home),
+                'url': request.build_absolute_uri(),
+                'updated': newest[0] or timezone.now(),
+                'absolute': request.build_absolute_uri,
+                'link': lambda post: request.build_absolute_uri(
+                    reverse('posts:post_detail', args=(post.pk,))
+                ),
+            }
+            chunks = WRITERS[feed_format](
+                feed, posts.for_feed()[:FEED_LENGTH].iterator()
+            )
+            response = StreamingHttpResponse(_cached_stream(chunks, key))
+        response['Content-Type'] = CONTENT_TYPES[feed_format]
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
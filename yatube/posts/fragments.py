@@ -0,0 +1,67 @@
+"""
+Кэш отрендеренных карточек постов (includes/post_item.html).
+
+Карточка меняется только при правке поста или смене имени автора, а
+рендерится на каждой странице ленты: reverse ссылок, формат даты и тег
+миниатюры sorl на каждый из десяти постов. Поэтому готовый HTML карточки
+кэшируется под ключом из id поста и версий его тегов:
+
+* fragment:post:<id> — поднимается при сохранении и удалении поста и
+  при готовности миниатюр;
+* fragment:author:<id> — при изменении пользователя.
+
+Это не теги страниц («post:<id>», «author:<username>»): те поднимаются
+на каждый комментарий, просмотр или новый пост автора, а карточка от
+них не зависит. Кэш карточек вложен в кэш страниц: страница, устаревшая
+из-за нового поста, собирается заново из девяти готовых карточек.
+Версии читаются одним get_many (в TieredCache — из памяти процесса),
+карточки страницы — вторым, рендерятся только промахи.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import instrumentation
+
+from . import caching
+
+FRAGMENT_TIMEOUT: int = 60 * 60 * 24  # сутки: инвалидация по версиям
+FRAGMENT_KEY: str = 'fragment:post_item:{post_id}:{versions}'
+TEMPLATE: str = 'includes/post_item.html'
+
+
+def post_tags(post_id, author_id):
+    """Теги, от которых зависит карточка поста."""
+    return f'fragment:post:{post_id}', f'fragment:author:{author_id}'
+
+
+def render_items(posts):
+    """Карточки постов: [(пост, html)] в порядке posts."""
+    posts = list(posts)
+    tags = {
+        post.pk: post_tags(post.pk, post.author_id) for post in posts
+    }
+    unique = sorted({tag for pair in tags.values() for tag in pair})
+    current = dict(zip(unique, caching.versions(unique)))
+    keys = {
+        post.pk: FRAGMENT_KEY.format(
+            post_id=post.pk,
+            versions='.'.join(str(current[tag]) for tag in tags[post.pk]),
+        )
+        for post in posts
+    }
+    found = cache.get_many(list(keys.values()))
+    rendered = {}
+    items = []
+    for post in posts:
+        html = found.get(keys[post.pk])
+        if html is None:
+            html = rendered[keys[post.pk]] = render_to_string(
+                TEMPLATE, {'post': post}
+            )
+        items.append((post, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_TIMEOUT)
+    instrumentation.count_cache('fragment hit', len(posts) - len(rendered))
+    instrumentation.count_cache('fragment miss', len(rendered))
+    return items
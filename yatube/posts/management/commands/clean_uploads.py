@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные загрузки картинок старше суток.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=uploads.UPLOAD_TTL,
+            help='Возраст загрузки в секундах, после которого она удаляется.',
+        )
+
+    def handle(self, *args, **options):
+        removed = uploads.clean(options['max_age'])
+        self.stdout.write(f'Удалено загрузок: {removed}')
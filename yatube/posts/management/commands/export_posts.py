@@ -0,0 +1,67 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты в NDJSON или CSV потоком, не загружая выборку '
+        'в память целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-', help='Файл или «-» для stdout.'
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+        parser.add_argument('--author', help='Только посты этого автора.')
+        parser.add_argument('--group', help='Только посты этой группы.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by('pk')
+        if options['author']:
+            posts = posts.filter(author__username=options['author'])
+        if options['group']:
+            posts = posts.filter(group__slug=options['group'])
+        rows = posts.values_list(*bulk.EXPORT_FIELDS).iterator(
+            chunk_size=options['chunk_size']
+        )
+        output = options['output']
+        stream = (
+            self.stdout if output == '-'
+            else open(output, 'w', encoding='utf-8', newline='')
+        )
+        started = time.monotonic()
+        exported = 0
+        try:
+            if options['format'] == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(bulk.EXPORT_COLUMNS)
+            for row in rows:
+                row = (row[0], row[1].isoformat()) + row[2:]
+                if options['format'] == 'csv':
+                    writer.writerow(row)
+                else:
+                    stream.write(json.dumps(
+                        dict(zip(bulk.EXPORT_COLUMNS, row)),
+                        ensure_ascii=False,
+                    ) + '\n')
+                exported += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(
+            f'Выгружено {exported} постов, {exported / elapsed:.0f} строк/с'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import pageviews
+
+
+class Command(BaseCommand):
+    help = 'Немедленно сбрасывает накопленные просмотры постов в БД.'
+
+    def handle(self, *args, **options):
+        pageviews.request_flush()
+        flushed = pageviews.flush()
+        self.stdout.write(
+            f'Сброс запрошен у всех процессов, из этого: {flushed} просмотров'
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для постов с картинкой, у которых их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить миниатюры всех постов.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnails='')
+        done = 0
+        for pk, image in posts.values_list('pk', 'image').iterator():
+            try:
+                thumbnails.generate(pk, image)
+            except Exception as error:
+                self.stderr.write(f'Пост {pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(f'Миниатюры построены для {done} постов')
@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из NDJSON или CSV потоком, пачками bulk_create. '
+        'Поля записи: text, author, group, pub_date, image.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default=None,
+            help='Формат; по умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять одной транзакцией.',
+        )
+        parser.add_argument(
+            '--images', metavar='DIR',
+            help='Каталог, относительно которого заданы пути картинок.',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        self.verbosity = options['verbosity']
+        self.images = options['images']
+        self.create_missing = options['create_missing']
+        # Словари имя -> id загружаются один раз, а не запросом на строку.
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        started = time.monotonic()
+        imported = skipped = 0
+        with stream, bulk.explicit_pub_date():
+            batch = []
+            for number, record in self.read(stream, file_format):
+                try:
+                    batch.append(self.build(self.parse(record)))
+                except (CommandError, ValueError, TypeError) as error:
+                    skipped += 1
+                    self.stderr.write(f'Строка {number}: {error}')
+                    continue
+                if len(batch) >= options['batch_size']:
+                    imported += self.flush(batch, started, imported)
+                    batch = []
+            imported += self.flush(batch, started, imported)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Импортировано {imported} постов, пропущено {skipped}, '
+            f'{imported / elapsed:.0f} строк/с'
+        )
+
+    def read(self, stream, file_format):
+        """Пары (номер строки, запись); строки NDJSON разбираются в parse."""
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                yield number, line
+
+    def parse(self, record):
+        if isinstance(record, str):
+            record = json.loads(record)
+        if not isinstance(record, dict):
+            raise CommandError('запись должна быть объектом JSON')
+        return record
+
+    def flush(self, batch, started, imported):
+        with transaction.atomic():
+            bulk.insert_posts(batch)
+        if self.verbosity > 1 and batch:
+            done = imported + len(batch)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'{done} постов, {rate:.0f} строк/с')
+        return len(batch)
+
+    def build(self, record):
+        text = record.get('text')
+        if not text:
+            raise CommandError('пустой текст')
+        pub_date = timezone.now()
+        if record.get('pub_date'):
+            pub_date = parse_datetime(record['pub_date'])
+            if pub_date is None:
+                raise CommandError(f'неверная дата {record["pub_date"]!r}')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date, timezone.utc)
+        post = Post(
+            text=text,
+            pub_date=pub_date,
+            author_id=self.author_id(record.get('author')),
+            group_id=self.group_id(record.get('group')),
+        )
+        if record.get('image'):
+            post.image = self.store_image(record['image'])
+        return post
+
+    def author_id(self, username):
+        if not username:
+            raise CommandError('не указан автор')
+        if username not in self.authors:
+            if not self.create_missing:
+                raise CommandError(f'неизвестный автор {username!r}')
+            user = User.objects.create_user(username=username)
+            self.authors[username] = user.pk
+        return self.authors[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            if not self.create_missing:
+                raise CommandError(f'неизвестная группа {slug!r}')
+            group = Group.objects.create(title=slug, slug=slug)
+            self.groups[slug] = group.pk
+        return self.groups[slug]
+
+    def store_image(self, name):
+        if not self.images:
+            raise CommandError('картинки импортируются только с --images')
+        source = os.path.join(self.images, name)
+        if not os.path.isfile(source):
+            raise CommandError(f'нет файла {source}')
+        field = Post._meta.get_field('image')
+        with open(source, 'rb') as image:
+            return default_storage.save(
+                field.generate_filename(None, os.path.basename(name)),
+                File(image),
+            )
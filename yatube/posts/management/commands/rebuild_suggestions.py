@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться». '
+        'Запускается периодически, например по cron.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = suggestions.rebuild()
+        self.stdout.write(
+            f'Рекомендаций: {created} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярные посты и группы. '
+        'Запускается периодически, например по cron.'
+    )
+
+    def handle(self, *args, **options):
+        trending.refresh()
+        self.stdout.write('Популярное пересчитано')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок до TIMELINE_LENGTH записей.'
+
+    def handle(self, *args, **options):
+        users = TimelineEntry.objects.values('user').annotate(
+            entries=Count('pk')
+        ).filter(entries__gt=timeline.TIMELINE_LENGTH).values_list(
+            'user', flat=True
+        )
+        trimmed = 0
+        for user_id in users.iterator():
+            timeline.trim(user_id)
+            trimmed += 1
+        self.stdout.write(f'Обрезано лент: {trimmed}')
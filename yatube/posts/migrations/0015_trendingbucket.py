@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5, verbose_name='Вид')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id поста/группы')),
+                ('bucket', models.PositiveIntegerField(verbose_name='Номер часа')),
+                ('score', models.FloatField(default=0, verbose_name='Оценка')),
+            ],
+            options={
+                'verbose_name': 'Корзина популярности',
+                'verbose_name_plural': 'Корзины популярности',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingbucket',
+            index=models.Index(fields=['bucket'], name='trending_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'bucket'), name='unique_trending_bucket_constraint'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_trendingbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewers',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewers', serialize=False, to='posts.Post')),
+                ('sketch', models.BinaryField(verbose_name='Регистры HyperLogLog')),
+            ],
+            options={
+                'verbose_name': 'Читатели поста',
+                'verbose_name_plural': 'Читатели постов',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Уникальных читателей (оценка)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество просмотров'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def segment(pk, width=7):
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = DIGITS[digit] + digits
+    return digits.rjust(width, '0')
+
+
+def fill_paths(apps, schema_editor):
+    # Старые комментарии — корни веток: путь из одного сегмента.
+    Comment = apps.get_model('posts', 'Comment')
+    table = Comment._meta.db_table
+    ids = list(Comment.objects.values_list('pk', flat=True))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {table} SET path = %s WHERE id = %s',
+            [(segment(pk), pk) for pk in ids],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество ответов в ветке'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
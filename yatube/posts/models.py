@@ -1,5 +1,8 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.functional import cached_property
 from core.models import CreatedModel
 
 User = get_user_model()
@@ -9,6 +12,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Группа')
     slug = models.SlugField(unique=True, verbose_name='Адрес')
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов'
+    )
 
     def __str__(self):
         return self.title
@@ -18,6 +26,18 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(
+            'pk', 'text', 'pub_date', 'image', 'thumbnails',
+            'comments_count',
+            'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__slug', 'group__title',
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(verbose_name='Текст поста')
     author = models.ForeignKey(
@@ -40,17 +60,62 @@ class Post(CreatedModel):
         blank=True,
         null=True,
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+    thumbnails = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюры (JSON)'
+    )
+    views_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество просмотров'
+    )
+    unique_viewers = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Уникальных читателей (оценка)'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @cached_property
+    def thumbnail_urls(self):
+        """URL готовых миниатюр: {размер: {формат: url}}."""
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
 
 class Comment(CreatedModel):
+    # Ширина сегмента пути: id в base36, дополненный нулями слева.
+    PATH_STEP = 7
+
     text = models.TextField(verbose_name='Текст комментария')
     post = models.ForeignKey(
         Post,
@@ -63,13 +128,48 @@ class Comment(CreatedModel):
         related_name='comments',
         verbose_name='Автор'
     )
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        max_length=255,
+        default='',
+        editable=False,
+        verbose_name='Путь в дереве'
+    )
+    replies_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество ответов в ветке'
+    )
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @property
+    def depth(self):
+        """Уровень вложенности: 0 у комментария к самому посту."""
+        return max(len(self.path) // self.PATH_STEP - 1, 0)
+
     class Meta:
+        ordering = ['pub_date']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_post_path_idx'
+            ),
+        ]
 
 
 class Follow(CreatedModel):
@@ -96,3 +196,184 @@ class Follow(CreatedModel):
                 name='unique_following_constraint'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class PostViewers(models.Model):
+    """Скетч HyperLogLog читателей поста, см. pageviews.py."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='viewers',
+    )
+    sketch = models.BinaryField(verbose_name='Регистры HyperLogLog')
+
+    def __str__(self):
+        return str(self.post_id)
+
+    class Meta:
+        verbose_name = 'Читатели поста'
+        verbose_name_plural = 'Читатели постов'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+        indexes = [
+            models.Index(
+                fields=['-followers_count'],
+                name='userstats_followers_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации поста')
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.post_id}'
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry_constraint'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+
+class Suggestion(models.Model):
+    """Рекомендованный автор: пересчитывается пакетно, см. suggestions.py."""
+    FRIENDS = 'friends'
+    SIMILAR = 'similar'
+    GROUP = 'group'
+    POPULAR = 'popular'
+    REASON_CHOICES = (
+        (FRIENDS, 'На него подписаны ваши подписки'),
+        (SIMILAR, 'Его читают вместе с вашими авторами'),
+        (GROUP, 'Пишет в ваших группах'),
+        (POPULAR, 'Популярный автор'),
+    )
+    REASONS = dict(REASON_CHOICES)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField(verbose_name='Оценка')
+    reason = models.CharField(
+        max_length=10,
+        choices=REASON_CHOICES,
+        verbose_name='Причина',
+    )
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}'
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion_constraint'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx'
+            )
+        ]
+
+
+class TrendingBucket(models.Model):
+    """Вовлечённость поста или группы за час, см. trending.py."""
+    POST = 'post'
+    GROUP = 'group'
+    KIND_CHOICES = (
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField(
+        max_length=5,
+        choices=KIND_CHOICES,
+        verbose_name='Вид',
+    )
+    object_id = models.PositiveIntegerField(verbose_name='id поста/группы')
+    bucket = models.PositiveIntegerField(verbose_name='Номер часа')
+    score = models.FloatField(default=0, verbose_name='Оценка')
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}@{self.bucket}'
+
+    class Meta:
+        verbose_name = 'Корзина популярности'
+        verbose_name_plural = 'Корзины популярности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'bucket'],
+                name='unique_trending_bucket_constraint'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='trending_bucket_idx'),
+        ]
@@ -0,0 +1,291 @@
+"""
+Счётчик просмотров постов с отложенной записью (write-behind).
+
+UPDATE на каждый просмотр упёрся бы в единственного писателя SQLite,
+поэтому просмотры копятся в памяти процесса: число просмотров и скетч
+HyperLogLog уникальных читателей на каждый пост. Фоновый поток раз в
+FLUSH_INTERVAL секунд (или раньше, если накопилось FLUSH_THRESHOLD
+просмотров) сбрасывает буфер в БД пакетными UPDATE ... CASE и сливает
+скетчи с сохранёнными в PostViewers. При падении процесса теряется не
+больше одного буфера — это цена отсутствия записи на каждый запрос.
+Сброшенные просмотры идут и в рейтинг популярного (trending.py).
+
+manage.py flush_views просит все процессы сбросить буферы немедленно:
+поток проверяет флаг в общем кэше раз в секунду.
+
+Сброс не поднимает версии страниц: иначе каждый просмотренный пост
+выпадал бы из кэша раз в FLUSH_INTERVAL. Закэшированная страница поста
+живёт не дольше STALE_COUNTS, на столько и отстают её счётчики.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.cache_backends import shared_cache
+
+from . import trending
+from .models import Post, PostViewers
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL: int = 10  # секунд между сбросами буфера
+FLUSH_THRESHOLD: int = 1000  # столько просмотров сбрасывается сразу
+FLUSH_BATCH: int = 500  # постов в одном UPDATE
+FLUSH_KEY: str = 'pageviews:flush'
+TICK: int = 1  # как часто поток проверяет флаг сброса
+STALE_COUNTS: int = 5 * 60  # TTL кэша страницы поста со счётчиками
+HLL_PRECISION: int = 10  # 1024 регистра, погрешность около 3%
+HLL_REGISTERS: int = 1 << HLL_PRECISION
+
+
+class Sketch:
+    """HyperLogLog: оценка числа уникальных ключей по регистрам-максимумам."""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers or HLL_REGISTERS)
+
+    def add(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        index = value >> (64 - HLL_PRECISION)
+        rest = value & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = 64 - HLL_PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, registers):
+        self.registers = bytearray(map(max, self.registers, registers))
+
+    def estimate(self):
+        size = HLL_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(
+            2.0 ** -register for register in self.registers
+        )
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * size and zeros:
+            # Малые количества точнее считает linear counting.
+            return round(size * math.log(size / zeros))
+        return round(raw)
+
+
+class Buffer:
+    """Накопленные в процессе просмотры и фоновый поток их сброса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = Counter()
+        self.sketches = {}
+        self.pending = 0
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.flushed_at = time.monotonic()
+        self.flush_requested = None
+
+    def add(self, post_id, viewer):
+        with self.lock:
+            self.views[post_id] += 1
+            sketch = self.sketches.get(post_id)
+            if sketch is None:
+                sketch = self.sketches[post_id] = Sketch()
+            sketch.add(viewer)
+            self.pending += 1
+            pending = self.pending
+        if pending >= FLUSH_THRESHOLD:
+            self.wakeup.set()
+
+    def take(self):
+        with self.lock:
+            views, self.views = self.views, Counter()
+            sketches, self.sketches = self.sketches, {}
+            self.pending = 0
+        return views, sketches
+
+    def restore(self, views, sketches):
+        """Возвращает в буфер просмотры, которые не удалось записать."""
+        with self.lock:
+            self.views.update(views)
+            for post_id, sketch in sketches.items():
+                current = self.sketches.get(post_id)
+                if current is None:
+                    self.sketches[post_id] = sketch
+                else:
+                    current.merge(sketch.registers)
+            self.pending += sum(views.values())
+
+    def start(self):
+        """Запускает поток сброса, если он ещё не запущен."""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.flush_requested = shared_cache().get(FLUSH_KEY)
+            self.thread = threading.Thread(
+                target=self.run, name='pageviews', daemon=True
+            )
+            self.thread.start()
+        atexit.register(_flush_at_exit)
+
+    def due(self):
+        if self.wakeup.is_set():
+            return True
+        if time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            return True
+        requested = shared_cache().get(FLUSH_KEY)
+        if requested != self.flush_requested:
+            self.flush_requested = requested
+            return True
+        return False
+
+    def run(self):
+        while True:
+            self.wakeup.wait(TICK)
+            try:
+                if self.due():
+                    self.wakeup.clear()
+                    flush()
+            except Exception:
+                logger.exception('Не удалось сбросить просмотры')
+            finally:
+                connection.close()
+
+
+_buffer = Buffer()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception as error:
+        # БД при выходе может быть уже недоступна: теряем один буфер.
+        logger.warning('Просмотры не сброшены при выходе: %s', error)
+
+
+def viewer_key(request):
+    """Кто смотрит: пользователь или хэш адреса и браузера анонима."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'anon:' + hashlib.blake2b(
+        '|'.join((
+            request.META.get('REMOTE_ADDR', ''),
+            request.META.get('HTTP_USER_AGENT', ''),
+        )).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def record(post_id, viewer):
+    """Засчитывает просмотр: только память процесса, без запросов к БД."""
+    _buffer.add(post_id, viewer)
+    if settings.PAGEVIEWS_BACKGROUND:
+        # Поток стартует после коммита, вне транзакции запроса.
+        transaction.on_commit(_buffer.start)
+
+
+def counted(view):
+    """Засчитывает успешный GET view(request, post_id) как просмотр."""
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if request.method == 'GET' and response.status_code == 200:
+            record(post_id, viewer_key(request))
+        return response
+    return wrapper
+
+
+def _when(values):
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _flush_batch(views, sketches):
+    """Один пакет постов; возвращает {id: группа} ещё существующих."""
+    ids = list(views)
+    Post.objects.filter(pk__in=ids).update(
+        views_count=F('views_count') + _when(views)
+    )
+    stored = {
+        post_id: bytes(registers) for post_id, registers in
+        PostViewers.objects.select_for_update().filter(
+            post__in=ids
+        ).values_list('post', 'sketch')
+    }
+    existing = dict(
+        Post.objects.filter(pk__in=ids).values_list('pk', 'group')
+    )
+    estimates = {}
+    for post_id in existing:
+        sketch = sketches[post_id]
+        if post_id in stored:
+            sketch.merge(stored[post_id])
+        estimates[post_id] = sketch.estimate()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {PostViewers._meta.db_table} (post_id, sketch) '
+            'VALUES (%s, %s) '
+            'ON CONFLICT (post_id) DO UPDATE SET sketch = excluded.sketch',
+            [
+                (post_id, bytes(sketches[post_id].registers))
+                for post_id in existing
+            ],
+        )
+    if estimates:
+        Post.objects.filter(pk__in=estimates).update(
+            unique_viewers=_when(estimates)
+        )
+    return existing
+
+
+def flush():
+    """
+    Сбрасывает буфер процесса в БД и возвращает число просмотров.
+
+    Счётчики сдвигаются первым UPDATE, поэтому запись в SQLite
+    захвачена до чтения скетчей и параллельный сброс из другого
+    процесса не затрёт слитые регистры.
+    """
+    views, sketches = _buffer.take()
+    _buffer.flushed_at = time.monotonic()
+    if not views:
+        return 0
+    ids = sorted(views)
+    groups = {}
+    try:
+        for start in range(0, len(ids), FLUSH_BATCH):
+            batch = ids[start:start + FLUSH_BATCH]
+            with transaction.atomic():
+                groups.update(_flush_batch(
+                    {pk: views[pk] for pk in batch},
+                    {pk: sketches[pk] for pk in batch},
+                ))
+    except Exception:
+        # Незаписанные пакеты возвращаются в буфер до следующего сброса,
+        # иначе, например, «database is locked» их бы потерял. Повторное
+        # слияние регистров безопасно: оно берёт максимум.
+        rest = ids[start:]
+        _buffer.restore(
+            {pk: views[pk] for pk in rest},
+            {pk: sketches[pk] for pk in rest},
+        )
+        raise
+    finally:
+        for post_id, group_id in groups.items():
+            trending.record(
+                trending.VIEW, post_id, group_id, count=views[post_id]
+            )
+    return sum(views.values())
+
+
+def request_flush():
+    """Просит фоновые потоки всех процессов сбросить буферы."""
+    shared_cache().set(FLUSH_KEY, time.time(), None)
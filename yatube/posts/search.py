@@ -0,0 +1,219 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+
+Тексты постов лежат в виртуальной таблице posts_post_fts (rowid = id
+поста), которую синхронизируют сигналы модели Post. Слова запроса
+приводятся к основе облегчённым стеммером Портера для русского языка
+и ищутся по префиксу, поэтому «котами» находит «кот», «кота», «коту».
+Выдача ранжируется по bm25 и листается курсором (score, rowid).
+"""
+import re
+
+from django.core import signing
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE: str = 'posts_post_fts'
+SEARCH_SALT: str = 'posts.search'
+SNIPPET_TOKENS: int = 24  # длина фрагмента с подсветкой, в словах
+MIN_STEM: int = 3  # более короткие основы дают слишком широкий префикс
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+_WORD = re.compile(r'\w+')
+_RVRE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+_PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+_REFLEXIVE = re.compile(r'(с[яь])$')
+_ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$'
+)
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+_DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+_SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова (стеммер Портера); прочие слова как есть."""
+    word = word.lower().replace('ё', 'е')
+    match = _RVRE.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    temp = _PERFECTIVE_GERUND.sub('', rv, 1)
+    if temp == rv:
+        rv = _REFLEXIVE.sub('', rv, 1)
+        temp = _ADJECTIVE.sub('', rv, 1)
+        if temp != rv:
+            rv = _PARTICIPLE.sub('', temp, 1)
+        else:
+            temp = _VERB.sub('', rv, 1)
+            rv = _NOUN.sub('', rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+    rv = re.sub('и$', '', rv, 1)
+    if _DERIVATIONAL.match(rv):
+        rv = re.sub('ость?$', '', rv, 1)
+    temp = re.sub('ь$', '', rv, 1)
+    if temp == rv:
+        rv = re.sub('нн$', 'н', _SUPERLATIVE.sub('', rv, 1), 1)
+    else:
+        rv = temp
+    return prefix + rv
+
+
+def build_match(query):
+    """Строка MATCH для FTS5: все слова запроса как префиксы основ."""
+    terms = []
+    for word in _WORD.findall(query.lower()):
+        base = stem(word)
+        if len(base) < MIN_STEM:
+            base = word
+        terms.append(f'"{base}"*')
+    return ' '.join(terms)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_range(first_pk, last_pk):
+    """Добавляет в индекс посты с id от first_pk до last_pk."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid BETWEEN %s AND %s',
+            [first_pk, last_pk],
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} '
+            'WHERE id BETWEEN %s AND %s',
+            [first_pk, last_pk],
+        )
+
+
+def rebuild():
+    """Заполняет индекс заново из таблицы постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+
+
+def matching_ids_sql(query):
+    """SQL и параметры подзапроса id постов, подходящих под запрос."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [build_match(query)],
+    )
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def _decode_cursor(cursor):
+    try:
+        score, rowid = signing.loads(cursor, salt=SEARCH_SALT)
+        return float(score), int(rowid)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
+def search(query, cursor=None, limit=10):
+    """
+    Посты по запросу в порядке релевантности.
+
+    Возвращает (posts, next_cursor); у каждого поста есть атрибут
+    snippet — фрагмент текста с подсвеченными совпадениями.
+    """
+    match = build_match(query)
+    if not match:
+        return [], None
+    if not is_available():
+        found = Post.objects.for_feed().filter(text__icontains=query)
+        posts = list(found[:limit])
+        for post in posts:
+            post.snippet = post.text
+        return posts, None
+    position = _decode_cursor(cursor) if cursor else None
+    after = ''
+    params = [match]
+    if position is not None:
+        after = 'WHERE score > %s OR (score = %s AND id > %s)'
+        params += [position[0], position[0], position[1]]
+    # Ранжирование и LIMIT — во внутреннем запросе по одному bm25;
+    # snippet() дорогой и считается снаружи только для строк страницы:
+    # CROSS JOIN оставляет страницу внешним циклом, и каждая её строка
+    # находится в FTS по rowid под тем же MATCH.
+    sql = (
+        'SELECT page.id, page.score,'
+        f'  snippet({FTS_TABLE}, 0, %s, %s, %s, %s)'
+        ' FROM ('
+        '  SELECT id, score FROM ('
+        f'    SELECT rowid AS id, bm25({FTS_TABLE}) AS score'
+        f'    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        f'  ) {after} ORDER BY score, id LIMIT %s'
+        f') AS page CROSS JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = page.id'
+        f' WHERE {FTS_TABLE} MATCH %s'
+        ' ORDER BY page.score, page.id'
+    )
+    params = [
+        HIGHLIGHT_START, HIGHLIGHT_END, '…', SNIPPET_TOKENS
+    ] + params + [limit + 1, match]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_score, _ = rows[-1]
+        next_cursor = signing.dumps([last_score, last_id], salt=SEARCH_SALT)
+    posts_by_id = Post.objects.for_feed().in_bulk([row[0] for row in rows])
+    posts = []
+    for post_id, _, snippet in rows:
+        post = posts_by_id.get(post_id)
+        if post is not None:
+            post.snippet = _highlight(snippet)
+            posts.append(post)
+    return posts, next_cursor
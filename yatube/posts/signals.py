@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import (
+    caching, counters, followed, search, suggestions, threads, timeline,
+    trending,
+)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def author_tags(*user_ids):
+    return [
+        f'author:{username}' for username in User.objects.filter(
+            pk__in=user_ids
+        ).values_list('username', flat=True)
+    ]
+
+
+def group_tags(*group_ids):
+    return [
+        f'group:{slug}' for slug in Group.objects.filter(
+            pk__in=[pk for pk in group_ids if pk is not None]
+        ).values_list('slug', flat=True)
+    ]
+
+
+def bump_post_pages(post, *group_ids, counts_changed=False):
+    # group_counts — списки групп с числом постов; меняются только при
+    # создании, удалении или переносе поста.
+    caching.bump(
+        'posts',
+        *(['group_counts'] if counts_changed else []),
+        f'post:{post.pk}',
+        f'fragment:post:{post.pk}',
+        *author_tags(post.author_id),
+        *group_tags(post.group_id, *group_ids),
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    update_fields = kwargs.get('update_fields')
+    if not created and set(update_fields or ()) != {'last_login'}:
+        caching.bump(
+            'users',
+            f'author:{instance.username}',
+            f'fragment:author:{instance.pk}',
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump('groups', f'group:{instance.slug}')
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # __dict__, а не атрибут: поле может быть отложено через only().
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._initial_group_id
+    moved = 'group_id' in instance.__dict__ and (
+        old_group_id != instance.group_id
+    )
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif moved:
+        counters.change(Group, old_group_id, 'posts_count', -1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    bump_post_pages(
+        instance, old_group_id, counts_changed=created or moved
+    )
+    instance._initial_group_id = instance.__dict__.get('group_id')
+    update_fields = kwargs.get('update_fields')
+    if 'text' in instance.__dict__ and (
+        update_fields is None or 'text' in update_fields
+    ):
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+    search.unindex_post(instance.pk)
+    bump_post_pages(instance, counts_changed=True)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change(Post, instance.post_id, 'comments_count', 1)
+        threads.attach(instance)
+        trending.record(
+            trending.COMMENT, instance.post_id, instance.post.group_id
+        )
+    # comments — числа комментариев в списках постов API.
+    caching.bump(f'post:{instance.post_id}', 'comments')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(Post, instance.post_id, 'comments_count', -1)
+    threads.detach(instance)
+    caching.bump(f'post:{instance.post_id}', 'comments')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        timeline.followers_changed(instance.author_id, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        suggestions.forget(instance.user_id, instance.author_id)
+        trending.record_follow(instance.author_id)
+    followed.forget(instance.user_id)
+    timeline.forget_celebrities(instance.user_id)
+    caching.bump(*author_tags(instance.author_id, instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    timeline.followers_changed(instance.author_id, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    followed.forget(instance.user_id)
+    timeline.forget_celebrities(instance.user_id)
+    caching.bump(*author_tags(instance.author_id, instance.user_id))
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_items(posts):
+    """Карточки постов страницы из кэша: {% post_items page_obj as items %}."""
+    return fragments.render_items(posts)
@@ -0,0 +1,133 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search, timeline
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class BulkImportExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, lines):
+        path = f'{self.directory}/{name}'
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_import_runs_signal_work_in_bulk(self):
+        """Импорт сохраняет даты и обновляет счётчики, ленты и поиск."""
+        records = [
+            {
+                'text': f'Импортированный котик {i}',
+                'author': 'author',
+                'group': 'test_slug' if i % 2 else '',
+                'pub_date': f'2020-01-0{i + 1}T12:00:00',
+            }
+            for i in range(5)
+        ]
+        records.append({'text': 'Без автора', 'author': 'nobody'})
+        path = self.write(
+            'posts.ndjson', [json.dumps(record) for record in records]
+        )
+        stderr = StringIO()
+        call_command(
+            'import_posts', path, batch_size=2,
+            stdout=StringIO(), stderr=stderr,
+        )
+        self.assertIn('nobody', stderr.getvalue())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(
+            Post.objects.earliest('pub_date').pub_date.isoformat(),
+            '2020-01-01T12:00:00+00:00',
+        )
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 5)
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(timeline.feed(self.reader)[0].count(), 5)
+        posts, _ = search.search('котики')
+        self.assertEqual(len(posts), 5)
+
+    def test_malformed_line_is_skipped(self):
+        """Битая строка пропускается с номером, остальные сохраняются."""
+        record = json.dumps({'text': 'Пост', 'author': 'author'})
+        path = self.write(
+            'posts.ndjson', [record, '{"text": "обрыв', '', record]
+        )
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_posts', path, batch_size=10,
+            stdout=stdout, stderr=stderr,
+        )
+        self.assertIn('Строка 2:', stderr.getvalue())
+        self.assertIn('пропущено 1', stdout.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_non_object_line_is_skipped(self):
+        record = json.dumps({'text': 'Пост', 'author': 'author'})
+        path = self.write('posts.ndjson', [record, '[1, 2]', '"текст"'])
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=stdout, stderr=stderr)
+        self.assertIn(
+            'Строка 2: запись должна быть объектом', stderr.getvalue()
+        )
+        self.assertIn('Строка 3:', stderr.getvalue())
+        self.assertIn('пропущено 2', stdout.getvalue())
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_round_trip(self):
+        """Выгрузка в CSV загружается обратно без потерь."""
+        Post.objects.create(
+            author=self.author, text='Текст, с "кавычками"\nи переносом',
+            group=self.group,
+        )
+        output = f'{self.directory}/posts.csv'
+        call_command(
+            'export_posts', output=output, format='csv', chunk_size=1,
+            stderr=StringIO(),
+        )
+        Post.objects.all().delete()
+        call_command('import_posts', output, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Текст, с "кавычками"\nи переносом')
+        self.assertEqual(post.group, self.group)
+
+    def test_export_ndjson_to_stdout(self):
+        Post.objects.create(author=self.author, text='Пост')
+        stdout = StringIO()
+        call_command('export_posts', stdout=stdout, stderr=StringIO())
+        record = json.loads(stdout.getvalue())
+        self.assertEqual(record['author'], 'author')
+        self.assertIsNone(record['group'])
+
+    def test_create_missing(self):
+        path = self.write('posts.ndjson', [json.dumps(
+            {'text': 'Пост', 'author': 'newcomer', 'group': 'new_group'}
+        )])
+        call_command(
+            'import_posts', path, create_missing=True, stdout=StringIO()
+        )
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertEqual(post.group.slug, 'new_group')
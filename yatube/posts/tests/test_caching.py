@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from core.cache_backends import TieredCache, shared_cache
+from posts import caching
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.body = b'old'
+
+        @caching.cache_anonymous_page
+        def view(request):
+            caching.depends_on(request, 'posts')
+            body = self.body
+            if body == b'old':
+                # Пост изменился, пока страница рендерилась.
+                self.body = b'new'
+                caching.bump('posts')
+            return HttpResponse(body)
+        self.view = view
+
+    def get(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return self.view(request).content
+
+    def test_bump_during_render_is_not_served(self):
+        self.assertEqual(self.get(), b'old')
+        self.assertEqual(self.get(), b'new')
+        self.assertEqual(self.get(), b'new')
+
+    def test_bump_repeats_after_commit(self):
+        """В транзакции версия поднимается сразу и ещё раз после коммита."""
+        before = caching.versions(('posts',))
+        with mock.patch.object(
+            caching.transaction, 'on_commit'
+        ) as on_commit:
+            caching.bump('posts')
+        after_bump = caching.versions(('posts',))
+        self.assertNotEqual(after_bump, before)
+        on_commit.assert_called_once()
+        on_commit.call_args[0][0]()
+        self.assertNotEqual(caching.versions(('posts',)), after_bump)
+
+    def test_versions_live_in_shared_cache(self):
+        """bump() пишет версии в общий кэш и не очищает L1 воркеров."""
+        before = caching.versions(('posts',))
+        with mock.patch.object(TieredCache, 'invalidate') as invalidate:
+            caching.bump('posts')
+        invalidate.assert_not_called()
+        self.assertEqual(
+            (shared_cache().get(caching.VERSION_KEY.format(tag='posts')),),
+            caching.versions(('posts',)),
+        )
+        self.assertNotEqual(caching.versions(('posts',)), before)
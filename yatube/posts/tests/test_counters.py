@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import caching, counters
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lev')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def refresh(self, obj):
+        obj.refresh_from_db()
+        return obj
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев следуют за созданием/удалением."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        self.assertEqual(self.refresh(post).comments_count, 1)
+        self.assertEqual(self.refresh(self.group).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.refresh(self.group).posts_count, 0)
+        self.assertEqual(self.refresh(self.other_group).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.refresh(self.other_group).posts_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0
+        )
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_recount_counters_fixes_drift(self):
+        """Команда recount_counters исправляет разошедшиеся счётчики."""
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Group.objects.update(posts_count=0)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertEqual(self.refresh(self.group).posts_count, 1)
+
+
+class CountServiceTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lev')
+        for i in range(3):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_count_is_exact_and_cached(self):
+        posts = Post.objects.all()
+        self.assertEqual(counters.count('posts', posts, ('posts',)), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.count('posts', posts, ('posts',)), 3)
+        Post.objects.create(author=self.author, text='Ещё')
+        self.assertEqual(counters.count('posts', posts, ('posts',)), 4)
+
+    def test_large_count_is_estimated_and_kept(self):
+        """Большое множество: оценка без COUNT(*), при смене тегов — кэш."""
+        posts = Post.objects.all()
+        with mock.patch.object(counters, 'EXACT_LIMIT', 2):
+            with mock.patch.object(
+                counters, 'estimate', return_value=1000
+            ), self.assertNumQueries(0):
+                value = counters.count(
+                    'posts', posts, ('posts',), estimated=True
+                )
+            self.assertEqual(value, 1000)
+            caching.bump('posts')
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    counters.count('posts', posts, ('posts',)), 1000
+                )
+
+    def test_estimate_spans_primary_keys(self):
+        self.assertEqual(counters.estimate(Post.objects.all()), 3)
+        self.assertEqual(counters.estimate(Post.objects.none()), 0)
@@ -0,0 +1,137 @@
+import json
+import time
+from http import HTTPStatus
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author, text=f'Пост <{i}> & ко', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_formats(self):
+        """Atom, RSS и JSON Feed корректно разбираются."""
+        url = reverse('posts:group_feed', args=(self.group.slug, 'atom'))
+        response = self.client.get(url)
+        self.assertEqual(
+            response['Content-Type'], 'application/atom+xml; charset=utf-8'
+        )
+        atom = ElementTree.fromstring(self.body(response))
+        entries = atom.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(
+            entries[0].find(f'{ATOM}content').text, 'Пост <2> & ко'
+        )
+        self.assertEqual(
+            entries[0].find(f'{ATOM}author/{ATOM}name').text, 'Лев Толстой'
+        )
+        rss = ElementTree.fromstring(self.body(self.client.get(
+            reverse('posts:profile_feed', args=('author', 'rss'))
+        )))
+        self.assertEqual(len(rss.findall('channel/item')), 3)
+        feed = json.loads(self.body(
+            self.client.get(reverse('posts:feed', args=('json',)))
+        ))
+        self.assertEqual(feed['items'][0]['content_text'], 'Пост <2> & ко')
+        self.assertEqual(feed['items'][0]['tags'], ['Тестовая группа'])
+
+    def test_conditional_and_cached_polls(self):
+        """Повторный опрос стоит одного запроса к базе."""
+        url = reverse('posts:feed', args=('atom',))
+        first = self.client.get(url)
+        body = self.body(first)
+        etag = first['ETag']
+        self.assertTrue(first.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.content.decode(), body)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag, хотя самый свежий пост тот же."""
+        url = reverse('posts:feed', args=('rss',))
+        etag = self.client.get(url)['ETag']
+        post = Post.objects.earliest('pub_date')
+        post.text = 'Исправлено'
+        post.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_edit_moves_last_modified(self):
+        """Last-Modified идёт от изменения тегов, а не от pub_date."""
+        url = reverse('posts:feed', args=('atom',))
+        last_modified = self.client.get(url)['Last-Modified']
+        post = Post.objects.earliest('pub_date')
+        post.text = 'Исправлено'
+        with mock.patch(
+            'posts.caching.time.time', return_value=time.time() + 60
+        ):
+            post.save()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_cached_body_is_per_host(self):
+        """Тело с абсолютными ссылками кэшируется отдельно для хоста."""
+        url = reverse('posts:feed', args=('rss',))
+        self.body(self.client.get(url))
+        other = self.body(self.client.get(url, HTTP_HOST='localhost'))
+        self.assertIn('http://localhost/', other)
+        self.assertNotIn('http://testserver/', other)
+
+    def test_missing_feeds(self):
+        """Неизвестные формат, группа и автор дают 404."""
+        urls = (
+            reverse('posts:feed', args=('pdf',)),
+            reverse('posts:group_feed', args=('missing', 'atom')),
+            reverse('posts:profile_feed', args=('nobody', 'json')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
+
+    def test_empty_group_feed(self):
+        empty = Group.objects.create(title='Пусто', slug='empty')
+        response = self.client.get(
+            reverse('posts:group_feed', args=(empty.slug, 'json'))
+        )
+        self.assertEqual(json.loads(self.body(response))['items'], [])
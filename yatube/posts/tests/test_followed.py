@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.cache_backends import shared_cache
+from posts import caching, followed
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowedAuthorsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[2])
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_membership_from_one_cache_get(self):
+        authors = followed.for_user(self.reader)
+        self.assertIn(self.authors[0].pk, authors)
+        self.assertIn(self.authors[2].pk, authors)
+        self.assertNotIn(self.authors[1].pk, authors)
+        self.assertEqual(len(authors), 2)
+        with self.assertNumQueries(0):
+            cached = followed.for_user(self.reader)
+        self.assertEqual(list(cached.ids), list(authors.ids))
+        self.assertFalse(followed.for_user(AnonymousUser()))
+
+    def test_follow_and_unfollow_reset_cache(self):
+        followed.for_user(self.reader)
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        self.assertIn(self.authors[1].pk, followed.for_user(self.reader))
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(followed.for_user(self.reader))
+
+    def test_forget_repeats_after_commit(self):
+        """Ключ в общем кэше удаляется сразу и ещё раз после коммита."""
+        key = followed.FOLLOWING_KEY.format(user_id=self.reader.pk)
+        followed.for_user(self.reader)
+        self.assertIsNotNone(shared_cache().get(key))
+        with mock.patch.object(
+            caching.transaction, 'on_commit'
+        ) as on_commit:
+            followed.forget(self.reader.pk)
+        self.assertIsNone(shared_cache().get(key))
+        followed.for_user(self.reader)
+        on_commit.call_args[0][0]()
+        self.assertIsNone(shared_cache().get(key))
+
+    def test_listing_shows_follow_state(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Отписаться', count=2)
+        self.assertContains(response, 'Подписаться', count=1)
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=(self.authors[1].username,)),
+        )
+
+    def test_follow_returns_to_next(self):
+        index = reverse('posts:index')
+        response = self.client.get(
+            reverse('posts:profile_follow', args=(self.authors[1].username,)),
+            {'next': index},
+        )
+        self.assertRedirects(response, index)
+        response = self.client.get(
+            reverse(
+                'posts:profile_unfollow', args=(self.authors[1].username,)
+            ),
+            {'next': 'https://example.com/'},
+        )
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', args=(self.authors[1].username,)),
+        )
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import fragments
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Lev', first_name='Лев', last_name='Толстой'
+        )
+        cls.other = User.objects.create_user(username='Reader')
+        cls.first = Post.objects.create(author=cls.author, text='Первый')
+        cls.second = Post.objects.create(author=cls.other, text='Второй')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self):
+        """Карточки постов и число отрендеренных заново."""
+        posts = Post.objects.for_feed().order_by('pk')
+        with mock.patch(
+            'posts.fragments.render_to_string',
+            wraps=fragments.render_to_string,
+        ) as render:
+            items = fragments.render_items(posts)
+        return {post.pk: html for post, html in items}, render.call_count
+
+    def test_fragments_rendered_once(self):
+        items, rendered = self.render()
+        self.assertEqual(rendered, 2)
+        self.assertIn('Первый', items[self.first.pk])
+        self.assertIn('Лев Толстой', items[self.first.pk])
+        cached, rendered = self.render()
+        self.assertEqual(rendered, 0)
+        self.assertEqual(cached, items)
+
+    def test_edit_invalidates_only_its_post(self):
+        self.render()
+        self.first.text = 'Исправленный'
+        self.first.save()
+        items, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Исправленный', items[self.first.pk])
+
+    def test_author_rename_invalidates_author_posts(self):
+        self.render()
+        self.author.first_name = 'Николай'
+        self.author.save()
+        items, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Николай Толстой', items[self.first.pk])
+
+    def test_comment_keeps_fragment(self):
+        """Комментарий устаревает страницу поста, но не его карточку."""
+        self.render()
+        Comment.objects.create(post=self.first, author=self.other, text='Да')
+        _, rendered = self.render()
+        self.assertEqual(rendered, 0)
+
+    def test_listing_uses_fragments(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Первый')
+        self.assertContains(
+            response, reverse('posts:post_detail', args=[self.second.pk])
+        )
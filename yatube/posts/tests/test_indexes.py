@@ -0,0 +1,92 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Строка плана SQLite вида «SCAN posts_post» без USING INDEX —
+# полный проход по таблице.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+
+
+def full_scans(sql):
+    """Таблицы, которые запрос читает полным сканированием."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        plan = [row[-1] for row in cursor.fetchall()]
+    return [
+        match.group(1) for match in map(FULL_SCAN.search, plan) if match
+    ]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц постов идут по индексам, а не полным сканом."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lev')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ком')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def assert_no_full_scans(self, url):
+        for params in ({}, {'page': 2}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            cursor = getattr(response.context['page_obj'], 'next_cursor',
+                             None) if 'page_obj' in response.context else None
+            if cursor:
+                with CaptureQueriesContext(connection) as cursor_queries:
+                    self.client.get(url, {'cursor': cursor})
+                queries.captured_queries.extend(
+                    cursor_queries.captured_queries
+                )
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(full_scans(sql), [])
+
+    def test_index(self):
+        self.assert_no_full_scans(reverse('posts:index'))
+
+    def test_group_list(self):
+        self.assert_no_full_scans(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+
+    def test_profile(self):
+        self.assert_no_full_scans(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+
+    def test_post_detail(self):
+        self.assert_no_full_scans(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+
+    def test_follow_index(self):
+        self.assert_no_full_scans(reverse('posts:follow_index'))
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import caching, pageviews, trending
+from posts.models import Post, PostViewers, TrendingBucket
+
+User = get_user_model()
+
+
+class PageViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Lev')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        # Просмотры из других тестов не должны попасть в эти посты.
+        pageviews._buffer.take()
+
+    def test_views_are_buffered_until_flush(self):
+        """Просмотры, в том числе из кэша страниц, пишутся только сбросом."""
+        client = Client()
+        for _ in range(3):
+            client.get(self.url)
+        authorized = Client()
+        authorized.force_login(self.user)
+        authorized.get(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 0)
+        with self.assertNumQueries(0):
+            pageviews.record(self.post.pk, 'user:42')
+        self.assertEqual(pageviews.flush(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 5)
+        self.assertEqual(self.post.unique_viewers, 3)
+        self.assertContains(authorized.get(self.url), 'Просмотров: 5')
+        trending.refresh()
+        self.assertEqual(
+            trending.ranking(TrendingBucket.POST), [self.post.pk]
+        )
+
+    def test_flush_keeps_page_cache(self):
+        """Сброс не поднимает версии: счётчики устаревают по TTL страницы."""
+        with mock.patch('posts.caching.cache', wraps=cache) as page_cache:
+            Client().get(self.url)
+        self.assertEqual(
+            page_cache.set.call_args[0][2], pageviews.STALE_COUNTS
+        )
+        before = caching.versions((f'post:{self.post.pk}',))
+        pageviews.flush()
+        self.assertEqual(
+            caching.versions((f'post:{self.post.pk}',)), before
+        )
+        self.assertIsNone(pageviews._buffer.thread)
+
+    def test_unique_viewers_merge_across_flushes(self):
+        for number in range(200):
+            pageviews.record(self.post.pk, f'user:{number}')
+        pageviews.flush()
+        for number in range(100, 300):
+            pageviews.record(self.post.pk, f'user:{number}')
+        pageviews.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 400)
+        self.assertAlmostEqual(self.post.unique_viewers, 300, delta=30)
+        self.assertEqual(
+            len(PostViewers.objects.get(post=self.post).sketch),
+            pageviews.HLL_REGISTERS,
+        )
+
+    def test_failed_batch_returns_to_buffer(self):
+        """Сбой на втором пакете: первый записан, остальное ждёт сброса."""
+        other = Post.objects.create(author=self.user, text='Второй')
+        pageviews.record(self.post.pk, 'user:1')
+        for number in range(3):
+            pageviews.record(other.pk, f'user:{number}')
+        real_flush_batch = pageviews._flush_batch
+        calls = []
+
+        def flush_batch(views, sketches):
+            calls.append(list(views))
+            if len(calls) == 2:
+                raise OperationalError('database is locked')
+            return real_flush_batch(views, sketches)
+
+        with mock.patch.object(pageviews, 'FLUSH_BATCH', 1), \
+                mock.patch.object(pageviews, '_flush_batch', flush_batch):
+            with self.assertRaises(OperationalError):
+                pageviews.flush()
+        self.assertEqual(calls, [[self.post.pk], [other.pk]])
+        self.assertEqual(pageviews._buffer.pending, 3)
+        self.assertEqual(pageviews.flush(), 3)
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+        self.assertEqual(other.views_count, 3)
+        self.assertEqual(other.unique_viewers, 3)
+
+    def test_sketch_estimate(self):
+        sketch = pageviews.Sketch()
+        for number in range(20000):
+            sketch.add(str(number))
+        self.assertAlmostEqual(sketch.estimate(), 20000, delta=1500)
+
+    def test_deleted_post_is_skipped(self):
+        post = Post.objects.create(author=self.user, text='Удалится')
+        pageviews.record(post.pk, 'user:1')
+        pageviews.record(self.post.pk, 'user:1')
+        post.delete()
+        self.assertEqual(pageviews.flush(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 1)
+
+    def test_missing_post_is_not_counted(self):
+        Client().get(reverse('posts:post_detail', args=(10 ** 6,)))
+        self.assertEqual(pageviews.flush(), 0)
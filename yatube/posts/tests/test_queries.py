@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryCountTests(TestCase):
+    """Число запросов на странице не зависит от количества постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Lev', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def add_rows(self, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(author=author, text=f'Пост {i}',
+                                group=self.group)
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            Comment.objects.create(post=self.post, author=author, text='Ком')
+
+    def assert_constant_queries(self, url, expected):
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+        self.add_rows(12)
+        cache.clear()
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+
+    def test_index(self):
+        """
+        Сессия, пользователь, оценка и COUNT, посты, подписки (кэш пуст).
+        """
+        self.assert_constant_queries(reverse('posts:index'), 6)
+
+    def test_index_cached_count(self):
+        """
+        Сессия, пользователь, число постов и подписки — из кэша: остаётся
+        один запрос постов.
+        """
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:index'))
+
+    def test_group_list(self):
+        """
+        Сессия, пользователь, группа, посты, подписки: COUNT — счётчик
+        группы.
+        """
+        self.assert_constant_queries(
+            reverse('posts:group_list', args=(self.group.slug,)), 5
+        )
+
+    def test_profile(self):
+        """
+        Сессия, пользователь, автор со счётчиками, подписки, посты и два
+        запроса рекомендаций (сохранённые и популярные авторы).
+        """
+        self.assert_constant_queries(
+            reverse('posts:profile', args=(self.author.username,)), 7
+        )
+
+    def test_post_detail(self):
+        """Сессия, пользователь, пост, комментарии, подписки."""
+        self.assert_constant_queries(
+            reverse('posts:post_detail', args=(self.post.pk,)), 5
+        )
+
+    def test_follow_index(self):
+        """
+        Сессия, пользователь, крупные авторы, COUNT, посты и два запроса
+        рекомендаций.
+        """
+        self.assert_constant_queries(reverse('posts:follow_index'), 7)
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class StemTests(TestCase):
+    def test_russian_forms_share_stem(self):
+        """Падежные формы сводятся к общей основе."""
+        self.assertEqual(search.stem('котами'), search.stem('кота'))
+        self.assertEqual(search.stem('Программирование'), 'программирован')
+        self.assertEqual(search.stem('python'), 'python')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Lev')
+        self.cat_post = Post.objects.create(
+            author=self.user, text='Мы гуляли с котами по <парку>'
+        )
+        self.dog_post = Post.objects.create(
+            author=self.user, text='Собака лает на кота'
+        )
+
+    def test_search_finds_inflected_forms(self):
+        """Поиск находит посты по другим формам слова."""
+        posts, _ = search.search('кот')
+        self.assertEqual(
+            {post.pk for post in posts}, {self.cat_post.pk, self.dog_post.pk}
+        )
+        posts, _ = search.search('собаками')
+        self.assertEqual([post.pk for post in posts], [self.dog_post.pk])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        """Фрагмент подсвечивает совпадения и экранирует HTML."""
+        posts, _ = search.search('котов')
+        post = next(post for post in posts if post.pk == self.cat_post.pk)
+        self.assertIn('<mark>котами</mark>', post.snippet)
+        self.assertIn('&lt;парку&gt;', post.snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.dog_post.text = 'Попугай молчит'
+        self.dog_post.save()
+        self.assertEqual(search.search('собака')[0], [])
+        self.assertEqual(len(search.search('попугай')[0]), 1)
+        self.dog_post.delete()
+        self.assertEqual(search.search('попугай')[0], [])
+
+    def test_cursor_pagination(self):
+        """Курсор выдаёт следующую порцию результатов без повторов."""
+        first, cursor = search.search('кот', limit=1)
+        self.assertIsNotNone(cursor)
+        second, cursor = search.search('кот', cursor=cursor, limit=1)
+        self.assertIsNone(cursor)
+        self.assertNotEqual(first[0].pk, second[0].pk)
+
+    def test_search_page(self):
+        """Страница поиска показывает результаты."""
+        response = Client().get(reverse('posts:search'), {'q': 'лает'})
+        self.assertContains(response, '<mark>лает</mark>')
@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Group, Post, Suggestion
+
+User = get_user_model()
+
+
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'popular', 'niche', 'other', 'writer')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        edges = (
+            ('reader', 'friend'),
+            ('friend', 'popular'),
+            ('friend', 'niche'),
+            ('other', 'friend'),
+            ('other', 'popular'),
+        )
+        for user, author in edges:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for _ in range(3):
+            Post.objects.create(
+                author=cls.users['writer'], group=group, text='Текст'
+            )
+        Post.objects.create(
+            author=cls.users['reader'], group=group, text='Текст'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def suggested(self, name):
+        return list(
+            Suggestion.objects.filter(user=self.users[name]).values_list(
+                'author__username', 'reason'
+            )
+        )
+
+    def test_rebuild_ranks_candidates(self):
+        """Друзья друзей, похожие и авторы групп, без своих подписок."""
+        suggestions.rebuild()
+        self.assertEqual(self.suggested('reader'), [
+            ('popular', Suggestion.FRIENDS),
+            ('niche', Suggestion.FRIENDS),
+            ('writer', Suggestion.GROUP),
+        ])
+        self.assertNotIn('friend', dict(self.suggested('other')))
+
+    def test_rebuild_scores_outside_transaction(self):
+        """Подсчёт не держит блокировку записи: он идёт до транзакции."""
+        events = []
+        real_rows = suggestions._rows
+        real_atomic = suggestions.transaction.atomic
+
+        def rows(*args):
+            events.append('rows')
+            yield from real_rows(*args)
+
+        def atomic(*args, **kwargs):
+            events.append('atomic')
+            return real_atomic(*args, **kwargs)
+
+        with mock.patch.object(suggestions, '_rows', rows), \
+                mock.patch.object(suggestions.transaction, 'atomic', atomic):
+            created = suggestions.rebuild()
+        self.assertEqual(events[:2], ['rows', 'atomic'])
+        self.assertEqual(created, Suggestion.objects.count())
+
+    def test_pages_show_cached_suggestions(self):
+        suggestions.rebuild()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item['username'] for item in response.context['suggestions']],
+            ['popular', 'niche', 'writer'],
+        )
+        self.assertContains(response, 'На него подписаны ваши подписки')
+        response = self.client.get(
+            reverse('posts:profile', args=('niche',))
+        )
+        self.assertEqual(
+            [item['username'] for item in response.context['suggestions']],
+            ['popular', 'writer'],
+        )
+        with self.assertNumQueries(0):
+            suggestions.for_user(self.users['reader'])
+
+    def test_follow_forgets_suggestion(self):
+        suggestions.rebuild()
+        suggestions.for_user(self.users['reader'])
+        self.client.get(reverse('posts:profile_follow', args=('popular',)))
+        self.assertNotIn(
+            'popular',
+            [
+                item['username']
+                for item in suggestions.for_user(self.users['reader'])
+            ],
+        )
+
+    def test_new_user_gets_popular_authors(self):
+        newcomer = User.objects.create_user(username='newcomer')
+        self.assertEqual(
+            [item['username'] for item in suggestions.for_user(newcomer)],
+            ['friend', 'popular', 'niche'],
+        )
+
+    def test_anonymous_profile_has_no_suggestions(self):
+        response = Client().get(reverse('posts:profile', args=('niche',)))
+        self.assertNotIn('suggestions', response.context)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Lev')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def reply(self, text, parent=None):
+        data = {'text': text}
+        if parent is not None:
+            data['parent'] = parent.pk
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)), data
+        )
+        return Comment.objects.get(text=text)
+
+    def test_replies_build_tree(self):
+        """Обход по path — дерево в глубину, счётчики веток растут."""
+        first = self.reply('Первый')
+        second = self.reply('Второй')
+        answer = self.reply('Ответ', first)
+        nested = self.reply('Ответ на ответ', answer)
+        self.assertEqual(
+            list(self.post.comments.order_by('path')),
+            [first, answer, nested, second],
+        )
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(nested.parent, answer)
+        first.refresh_from_db()
+        answer.refresh_from_db()
+        self.assertEqual((first.replies_count, answer.replies_count), (2, 1))
+        with self.assertNumQueries(1):
+            subtree = list(threads.subtree(answer))
+        self.assertEqual(subtree, [answer, nested])
+        nested.delete()
+        first.refresh_from_db()
+        self.assertEqual(first.replies_count, 1)
+
+    def test_deep_replies_are_flattened(self):
+        comment = self.reply('0')
+        for level in range(1, threads.MAX_DEPTH + 3):
+            comment = self.reply(str(level), comment)
+        self.assertEqual(comment.depth, threads.MAX_DEPTH)
+
+    def test_reply_to_other_post_comment_is_rejected(self):
+        other = Post.objects.create(author=self.user, text='Другой')
+        foreign = Comment.objects.create(
+            post=other, author=self.user, text='Чужой'
+        )
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Ответ', 'parent': foreign.pk},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_post_detail_paginates_comments(self):
+        """Комментарии подгружаются страницами по курсору."""
+        first = self.reply('Корень')
+        for number in range(threads.COMMENTS_ON_PAGE + 4):
+            self.reply(f'Ответ {number}', first)
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = Client().get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), threads.COMMENTS_ON_PAGE)
+        self.assertEqual(list(comments)[0], first)
+        rest = Client().get(url, {'comments': comments.next_cursor})
+        self.assertEqual(len(rest.context['comments']), 5)
+        self.assertIsNone(rest.context['comments'].next_cursor)
+        self.assertContains(response, 'Ответов в ветке: 54')
+
+    def test_thread_page(self):
+        root = self.reply('Корень')
+        answer = self.reply('Ответ', root)
+        self.reply('Отдельный')
+        response = Client().get(
+            reverse('posts:comment_thread', args=(self.post.pk, answer.pk))
+        )
+        self.assertEqual(list(response.context['comments']), [answer])
+        self.assertContains(response, 'На уровень выше')
+        reply_response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Ещё ответ', 'parent': answer.pk},
+        )
+        self.assertRedirects(
+            reply_response,
+            reverse('posts:comment_thread', args=(self.post.pk, root.pk)),
+        )
@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Lev')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=make_image()
+        )
+
+    def test_generate_persists_urls(self):
+        """Миниатюры всех размеров сохраняются и их URL пишутся в пост."""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        urls = self.post.thumbnail_urls
+        self.assertEqual(set(urls), set(thumbnails.THUMBNAIL_SIZES))
+        self.assertTrue(urls['card']['jpeg'].startswith(settings.MEDIA_URL))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, urls['small']['jpeg'])
+
+    def test_stale_image_is_not_overwritten(self):
+        """Миниатюры сменённой картинки не записываются в пост."""
+        old_name = self.post.image.name
+        self.post.image = make_image('other.jpg')
+        self.post.save()
+        thumbnails.generate(self.post.pk, old_name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnails, '')
+
+    def test_schedule_runs_inline_in_tests(self):
+        """В тестах миниатюры строятся после коммита без фонового пула."""
+        self.assertFalse(settings.THUMBNAILS_BACKGROUND)
+        with mock.patch('posts.thumbnails.transaction.on_commit') as commit, \
+                mock.patch.object(thumbnails, 'get_executor') as executor:
+            thumbnails.schedule(self.post)
+            commit.call_args[0][0]()
+        executor.assert_not_called()
+        self.post.refresh_from_db()
+        self.assertEqual(
+            set(self.post.thumbnail_urls), set(thumbnails.THUMBNAIL_SIZES)
+        )
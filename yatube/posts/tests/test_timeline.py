@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import caching, timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lev')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка переносит старые посты в ленту, отписка убирает."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author,))
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты автора с огромной аудиторией подмешиваются при чтении."""
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=self.author)
+            post = Post.objects.create(author=self.author, text='Новый пост')
+            self.assertFalse(TimelineEntry.objects.exists())
+            self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_rebuild_restores_trimmed_timelines(self):
+        """rebuild() собирает ленты по подпискам с учётом длины ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        newer = Post.objects.create(author=self.author, text='Новый пост')
+        TimelineEntry.objects.all().delete()
+        with mock.patch('posts.timeline.TIMELINE_LENGTH', 1):
+            timeline.rebuild()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, newer.pk)],
+        )
+
+    def test_feed_pages_by_timeline_entries(self):
+        """Страницы ленты режутся по (pub_date, post) записей ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        posts, key = timeline.feed(self.reader)
+        self.assertEqual(key, timeline.ENTRY_KEY)
+        first = self.reader_client.get(reverse('posts:follow_index'))
+        page = first.context['page_obj']
+        rest = self.reader_client.get(
+            reverse('posts:follow_index'), {'cursor': page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(page) + list(rest),
+            list(Post.objects.order_by('-pub_date', '-pk')),
+        )
+
+    def test_forget_celebrities_repeats_after_commit(self):
+        """Кэш крупных авторов удаляется сразу и ещё раз после коммита."""
+        with self.assertNumQueries(1):
+            timeline.followed_celebrities(self.reader.pk)
+        with mock.patch.object(
+            caching.transaction, 'on_commit'
+        ) as on_commit:
+            timeline.forget_celebrities(self.reader.pk)
+        with self.assertNumQueries(1):
+            timeline.followed_celebrities(self.reader.pk)
+        on_commit.call_args[0][0]()
+        with self.assertNumQueries(1):
+            timeline.followed_celebrities(self.reader.pk)
+
+    def test_celebrities_are_cached(self):
+        """Крупные авторы подписок читаются из кэша до смены подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(timeline.followed_celebrities(self.reader.pk), [])
+        with self.assertNumQueries(0):
+            timeline.followed_celebrities(self.reader.pk)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            other = User.objects.create_user(username='Other')
+            Follow.objects.create(user=other, author=self.author)
+            self.assertEqual(
+                timeline.followed_celebrities(self.reader.pk),
+                [self.author.pk],
+            )
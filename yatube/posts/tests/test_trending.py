@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, TrendingBucket
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lev')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.hot = Post.objects.create(
+            author=cls.author, text='Обсуждаемый', group=cls.group
+        )
+        cls.old = Post.objects.create(author=cls.reader, text='Вчерашний')
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+
+    def test_comments_rank_posts_and_groups(self):
+        self.comment(self.hot, 2)
+        self.comment(self.quiet)
+        trending.refresh()
+        self.assertEqual(
+            trending.ranking(TrendingBucket.POST),
+            [self.hot.pk, self.quiet.pk],
+        )
+        self.assertEqual(trending.groups(), [self.group])
+
+    def test_old_events_decay(self):
+        """Давние события весят меньше свежих, за окном не учитываются."""
+        now = time.time()
+        hours_ago = now - trending.HALF_LIFE * 2
+        trending.record(trending.COMMENT, self.old.pk, count=3,
+                        now=hours_ago)
+        trending.record(trending.COMMENT, self.quiet.pk, count=1, now=now)
+        totals = trending.scores(now)[TrendingBucket.POST]
+        self.assertGreater(totals[self.quiet.pk], totals[self.old.pk])
+        self.assertLess(totals[self.old.pk], trending.WEIGHTS['comment'])
+        expired = now - trending.BUCKET_SECONDS * trending.WINDOW_BUCKETS
+        trending.record(trending.COMMENT, self.hot.pk, now=expired)
+        trending.refresh(now)
+        self.assertFalse(
+            TrendingBucket.objects.filter(object_id=self.hot.pk).exists()
+        )
+        self.assertEqual(
+            trending.ranking(TrendingBucket.POST),
+            [self.quiet.pk, self.old.pk],
+        )
+
+    def test_new_follower_boosts_latest_post(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        trending.refresh()
+        self.assertEqual(trending.ranking(TrendingBucket.POST), [self.hot.pk])
+
+    def test_page_reads_precomputed_ranking(self):
+        """Страница — рейтинг из кэша и по запросу постов и групп по pk."""
+        self.comment(self.hot)
+        trending.refresh()
+        client = Client()
+        with self.assertNumQueries(2):
+            response = client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.hot])
+        self.assertEqual(response.context['groups'], [self.group])
+
+    def test_deleted_post_is_skipped(self):
+        self.comment(self.quiet)
+        trending.refresh()
+        Post.objects.filter(pk=self.quiet.pk).delete()
+        response = Client().get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [])
@@ -0,0 +1,172 @@
+import shutil
+import tempfile
+import time
+from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg():
+    image = Image.new('RGB', (300, 200), 'blue')
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Lev')
+        cls.other = User.objects.create_user(username='Other')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def start(self, content):
+        response = self.client.post(
+            reverse('posts:upload_start'), {'size': len(content)}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        return response.json()
+
+    def put(self, url, chunk, offset):
+        return self.client.put(
+            url, chunk, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def wait_ready(self, url):
+        # Так же поступает клиент: опрашивает загрузку до конца обработки.
+        deadline = time.monotonic() + 5
+        state = self.client.get(url).json()['state']
+        while state == uploads.PROCESSING and time.monotonic() < deadline:
+            time.sleep(0.05)
+            state = self.client.get(url).json()['state']
+        return state
+
+    def create_post(self, text, token):
+        return self.client.post(
+            reverse('posts:post_create'), {'text': text, 'upload': token}
+        )
+
+    def test_resumable_upload_attaches_to_post(self):
+        """Файл докачивается по частям и прикрепляется к посту."""
+        content = make_jpeg()
+        upload = self.start(content)
+        middle = len(content) // 2
+        response = self.put(upload['url'], content[:middle], 0)
+        self.assertEqual(response.json()['offset'], middle)
+        # Повтор с неверной позиции: сервер сообщает, откуда продолжать.
+        response = self.put(upload['url'], content[middle:], 0)
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertEqual(response['Upload-Offset'], str(middle))
+        self.assertEqual(
+            self.client.get(upload['url']).json()['offset'], middle
+        )
+        response = self.put(upload['url'], content[middle:], middle)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.wait_ready(upload['url']), uploads.READY)
+        response = self.create_post('Пост с загрузкой', upload['token'])
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = Post.objects.get(text='Пост с загрузкой')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        with Image.open(post.image.path) as image:
+            # EXIF убран, поворот применён к пикселям.
+            self.assertEqual(image.size, (200, 300))
+            self.assertNotIn(0x0112, image.getexif())
+
+    def test_processing_upload_is_not_waited_for(self):
+        """Пока картинка обрабатывается, форма сразу получает ошибку."""
+        content = make_jpeg()
+        upload = self.start(content)
+        with mock.patch('posts.uploads.thumbnails.get_executor'):
+            self.put(upload['url'], content, 0)
+        started = time.monotonic()
+        response = self.create_post('Рано', upload['token'])
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            'обрабатывается', response.context['form'].errors['image'][0]
+        )
+        self.assertFalse(Post.objects.filter(text='Рано').exists())
+
+    def test_upload_attaches_only_once(self):
+        """Один токен нельзя прикрепить ко второму посту."""
+        content = make_jpeg()
+        upload = self.start(content)
+        self.put(upload['url'], content, 0)
+        self.assertEqual(self.wait_ready(upload['url']), uploads.READY)
+        response = self.create_post('Первый', upload['token'])
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.create_post('Второй', upload['token'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(text='Второй').exists())
+
+    def test_not_an_image_is_rejected_early(self):
+        """Не-картинка отвергается по первым байтам."""
+        upload = self.start(b'x' * 100)
+        response = self.put(upload['url'], b'x' * 10, 0)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(upload['url']).status_code, HTTPStatus.NOT_FOUND
+        )
+
+    def test_truncated_image_is_rejected(self):
+        """Файл с подписью JPEG, но без заголовка, не принимается."""
+        content = b'\xff\xd8\xff\xe0' + b'\x00' * 60
+        upload = self.start(content)
+        response = self.put(upload['url'], content, 0)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_foreign_token_is_not_accepted(self):
+        """Чужой токен нельзя ни докачать, ни прикрепить."""
+        upload = self.start(make_jpeg())
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(
+            other.get(upload['url']).status_code, HTTPStatus.NOT_FOUND
+        )
+        response = other.post(
+            reverse('posts:post_create'),
+            {'text': 'Чужая картинка', 'upload': upload['token']},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(text='Чужая картинка').exists())
+
+    def test_limits(self):
+        response = self.client.post(
+            reverse('posts:upload_start'),
+            {'size': uploads.MAX_UPLOAD_SIZE + 1},
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_clean_removes_stale_uploads(self):
+        self.start(make_jpeg())
+        self.assertEqual(uploads.clean(max_age=-1), 1)
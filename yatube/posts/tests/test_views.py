@@ -9,6 +9,7 @@ from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from posts.models import Post, Group, Follow
+from posts.utils import ELLIPSIS, page_window
 from http import HTTPStatus
 
 
@@ -38,6 +39,7 @@ class PaginatorViewsTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
 
     def test_first_page_contains_ten_records(self):
         response = self.guest_client.get(reverse('posts:index'))
@@ -47,6 +49,49 @@ class PaginatorViewsTest(TestCase):
         response = self.guest_client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 2)
 
+    def test_cursor_navigation_matches_page_numbers(self):
+        """Переход по курсорам даёт те же посты, что и номера страниц."""
+        first = self.guest_client.get(reverse('posts:index'))
+        next_cursor = first.context['page_obj'].next_cursor
+        self.assertIsNotNone(next_cursor)
+        second = self.guest_client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        by_number = self.guest_client.get(
+            reverse('posts:index') + '?page=2'
+        )
+        self.assertEqual(
+            list(second.context['page_obj']),
+            list(by_number.context['page_obj']),
+        )
+        self.assertFalse(second.context['page_obj'].has_next())
+        previous = self.guest_client.get(
+            reverse('posts:index'),
+            {'cursor': second.context['page_obj'].previous_cursor}
+        )
+        self.assertEqual(
+            list(previous.context['page_obj']),
+            list(first.context['page_obj']),
+        )
+        self.assertFalse(previous.context['page_obj'].has_previous())
+
+    def test_forged_cursor_falls_back_to_first_page(self):
+        """Подделанный курсор не ломает страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'forged:token'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_page_window_is_elided(self):
+        """Окно номеров страниц не растёт с их числом."""
+        self.assertEqual(page_window(2, 5), [1, 2, 3, 4, 5])
+        self.assertEqual(
+            page_window(20, 40),
+            [1, ELLIPSIS, 18, 19, 20, 21, 22, ELLIPSIS, 40],
+        )
+        self.assertEqual(page_window(1, 40), [1, 2, 3, ELLIPSIS, 40])
+        self.assertEqual(page_window(40, 40), [1, ELLIPSIS, 38, 39, 40])
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostViewTests(TestCase):
@@ -210,13 +255,41 @@ class PostViewTests(TestCase):
             text='Пост для провери работы кэша',
             group=self.group
         )
-        response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.get(pk=post.id).delete()
-        response_2 = self.authorized_client.get(reverse('posts:index'))
+        response_1 = self.guest_client.get(reverse('posts:index'))
+        # update() обходит сигналы: кэш не знает об изменении.
+        Post.objects.filter(pk=post.id).update(text='Изменённый текст')
+        response_2 = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
-        response_3 = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.get(pk=post.id).delete()
+        response_3 = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
+        self.assertNotContains(response_3, 'Изменённый текст')
+
+    def test_cache_is_invalidated_precisely(self):
+        """Комментарий сбрасывает кэш поста, но не чужой группы."""
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+        detail_url = reverse('posts:post_detail', args=(self.post.id,))
+        other_url = reverse('posts:group_list', args=(other_group.slug,))
+        self.guest_client.get(detail_url)
+        self.guest_client.get(other_url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Свежий комментарий'},
+        )
+        self.assertContains(
+            self.guest_client.get(detail_url), 'Свежий комментарий'
+        )
+        self.assertIsNone(self.guest_client.get(other_url).context)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
 
     def test_users_can_follow_and_unfollow(self):
         """Авторизованный клиент может подписаться и отписаться."""
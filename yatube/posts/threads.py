@@ -0,0 +1,130 @@
+"""
+Ветки комментариев на материализованном пути.
+
+Путь комментария — id всех его предков и его собственный, каждый в
+base36 фиксированной ширины Comment.PATH_STEP. Сортировка по path даёт
+обход дерева в глубину, поддерево комментария — диапазон по индексу
+(post, path), а страница — следующий за курсором кусок этого диапазона:
+один запрос без COUNT и OFFSET при любой глубине и длине обсуждения.
+
+replies_count каждого комментария хранит размер его поддерева и
+сдвигается одним UPDATE по id из пути нового или удалённого ответа.
+"""
+from django.core import signing
+from django.db.models import F
+
+from .models import Comment
+
+MAX_DEPTH: int = 6  # ответы глубже прикрепляются к родителю
+COMMENTS_ON_PAGE: int = 50
+CURSOR_SALT: str = 'posts.comments'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def segment(pk):
+    """id в base36 ширины Comment.PATH_STEP: строки сортируются как числа."""
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = DIGITS[digit] + digits
+    return digits.rjust(Comment.PATH_STEP, '0')
+
+
+def ancestor_ids(path):
+    """id предков по пути, от корня ветки."""
+    step = Comment.PATH_STEP
+    return [
+        int(path[start:start + step], 36)
+        for start in range(0, len(path) - step, step)
+    ]
+
+
+def resolve_parent(post_id, parent_id):
+    """
+    Комментарий, к которому прикрепить ответ на parent_id.
+
+    Ответ глубже MAX_DEPTH становится соседом родителя, чтобы ветка
+    не уходила за край страницы. Чужой или несуществующий parent_id —
+    Comment.DoesNotExist.
+    """
+    try:
+        parent = Comment.objects.only('pk', 'path').get(
+            pk=int(parent_id), post=post_id
+        )
+    except (TypeError, ValueError):
+        raise Comment.DoesNotExist
+    if parent.depth >= MAX_DEPTH:
+        return Comment.objects.only('pk', 'path').get(
+            pk=ancestor_ids(parent.path)[-1]
+        )
+    return parent
+
+
+def attach(comment):
+    """Строит путь нового комментария и сдвигает счётчики предков."""
+    prefix = comment.parent.path if comment.parent_id else ''
+    comment.path = prefix + segment(comment.pk)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path)
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(pk__in=ancestors).update(
+            replies_count=F('replies_count') + 1
+        )
+
+
+def detach(comment):
+    """Уменьшает счётчики предков удалённого комментария."""
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(
+            pk__in=ancestors, replies_count__gt=0
+        ).update(replies_count=F('replies_count') - 1)
+
+
+def root_id(path):
+    """id комментария, с которого начинается ветка."""
+    return int(path[:Comment.PATH_STEP], 36)
+
+
+def subtree(comment):
+    """
+    Комментарий и все ответы на него: один диапазон по индексу.
+
+    Диапазон, а не path__startswith: LIKE в SQLite индекс не использует.
+    Символ «~» больше любой цифры base36.
+    """
+    return Comment.objects.filter(
+        post=comment.post_id,
+        path__gte=comment.path,
+        path__lt=comment.path + '~',
+    )
+
+
+class ThreadPage:
+    """Страница обхода дерева; следующая — по next_cursor."""
+
+    def __init__(self, comments, next_cursor):
+        self.comments = comments
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.comments)
+
+    def __len__(self):
+        return len(self.comments)
+
+
+def page(comments, cursor=None, per_page=COMMENTS_ON_PAGE):
+    """Страница комментариев по порядку веток после курсора."""
+    try:
+        after = signing.loads(cursor, salt=CURSOR_SALT) if cursor else None
+    except signing.BadSignature:
+        after = None
+    if isinstance(after, str):
+        comments = comments.filter(path__gt=after)
+    rows = list(comments.order_by('path')[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = signing.dumps(rows[-1].path, salt=CURSOR_SALT)
+    return ThreadPage(rows, next_cursor)
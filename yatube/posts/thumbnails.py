@@ -0,0 +1,111 @@
+"""
+Предварительная генерация миниатюр для Post.image.
+
+После сохранения картинки миниатюры всех размеров (JPEG и, если Pillow
+собран с поддержкой, WebP) строятся в фоновом пуле потоков, а их URL
+записываются в Post.thumbnails. Шаблоны берут готовые URL и не ходят
+ни в хранилище, ни в key-value store sorl; пока миниатюр нет, работает
+прежний тег {% thumbnail %}. При THUMBNAILS_BACKGROUND = False (в тестах)
+миниатюры строятся сразу после коммита в том же потоке: фоновая запись
+в MEDIA_ROOT пережила бы временный каталог теста.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = {
+    'card': (960, 339),
+    'small': (480, 170),
+}
+THUMBNAIL_QUALITY: int = 85
+THUMBNAIL_WORKERS: int = 2
+THUMBNAILS_DIR: str = 'posts/thumbs'
+
+_executor = None
+
+
+def _formats():
+    formats = [('jpeg', 'JPEG')]
+    if features.check('webp'):
+        formats.append(('webp', 'WEBP'))
+    return formats
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def render(image_name):
+    """Строит миниатюры картинки и возвращает их URL по размерам."""
+    with default_storage.open(image_name) as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    base = os.path.splitext(os.path.basename(image_name))[0]
+    urls = {}
+    for size_name, size in THUMBNAIL_SIZES.items():
+        thumb = ImageOps.fit(image, size, Image.LANCZOS, centering=(0.5, 0.5))
+        urls[size_name] = {}
+        for extension, pil_format in _formats():
+            buffer = BytesIO()
+            thumb.save(buffer, pil_format, quality=THUMBNAIL_QUALITY)
+            name = default_storage.save(
+                f'{THUMBNAILS_DIR}/{base}_{size_name}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+            urls[size_name][extension] = default_storage.url(name)
+    return urls
+
+
+def generate(post_id, image_name):
+    """Генерирует миниатюры поста, если его картинка не успела смениться."""
+    urls = render(image_name)
+    if Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnails=json.dumps(urls)
+    ):
+        # Карточка поста в кэше фрагментов собрана ещё без миниатюр.
+        caching.bump(f'fragment:post:{post_id}')
+
+
+def _generate_in_worker(post_id, image_name):
+    try:
+        generate(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+    finally:
+        # У потока пула своё соединение с БД, не оставляем его висеть.
+        connection.close()
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр в очередь после коммита транзакции."""
+    if not post.image:
+        return
+    post_id, image_name = post.pk, post.image.name
+    if not settings.THUMBNAILS_BACKGROUND:
+        transaction.on_commit(lambda: generate(post_id, image_name))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(
+            _generate_in_worker, post_id, image_name
+        )
+    )
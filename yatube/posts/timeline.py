@@ -0,0 +1,195 @@
+"""
+Материализованная лента подписок (fan-out-on-write).
+
+При публикации поста его id раскладывается по лентам подписчиков
+автора, и чтение /follow/ становится диапазонным сканом по индексу
+(user, pub_date) таблицы TimelineEntry. Для авторов с очень большим
+числом подписчиков раскладка не делается: их посты подмешиваются
+при чтении (fan-out-on-read).
+
+Таких авторов среди подписок пользователя feed() берёт из кэша: ключ
+сбрасывается при подписке и отписке, а версия тега «celebrities»
+поднимается, когда автор пересекает FANOUT_LIMIT. Лента без них
+сортируется и режется по (pub_date, post) записи ленты — это индекс
+timeline_user_pub_date_idx, без сортировки постов.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from core.cache_backends import shared_cache
+
+from . import caching
+from .models import Follow, Post, TimelineEntry, UserStats
+
+TIMELINE_LENGTH: int = 1000  # сколько последних постов хранится в ленте
+FANOUT_LIMIT: int = 5000  # больше подписчиков — посты читаются напрямую
+CELEBRITIES_KEY: str = 'celebrities:{user_id}:{version}'
+CELEBRITIES_TIMEOUT: int = 60 * 60 * 24  # сутки: сбрасывается сигналами
+ENTRY_KEY = ('timeline_entries__pub_date', 'timeline_entries__post')
+POST_KEY = ('pub_date', 'pk')
+
+
+def celebrity_ids(author_ids):
+    """Авторы из author_ids, посты которых не раскладываются по лентам."""
+    return list(
+        UserStats.objects.filter(
+            user__in=author_ids, followers_count__gt=FANOUT_LIMIT
+        ).values_list('user', flat=True)
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    followers = list(
+        Follow.objects.filter(author=post.author_id)
+        .values_list('user', flat=True)[:FANOUT_LIMIT + 1]
+    )
+    if len(followers) > FANOUT_LIMIT:
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_range(first_pk, last_pk):
+    """
+    Раскладывает по лентам посты с id от first_pk до last_pk.
+
+    Для постов, созданных через bulk_create, мимо сигналов: одна вставка
+    INSERT ... SELECT на весь диапазон вместо fan_out() на каждый пост.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Post._meta.db_table} p '
+            f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+            f'LEFT JOIN {UserStats._meta.db_table} s '
+            'ON s.user_id = p.author_id '
+            'WHERE p.id BETWEEN %s AND %s '
+            'AND COALESCE(s.followers_count, 0) <= %s '
+            'ON CONFLICT DO NOTHING',
+            [first_pk, last_pk, FANOUT_LIMIT],
+        )
+    followers = Follow.objects.filter(
+        author__posts__pk__range=(first_pk, last_pk)
+    ).values_list('user', flat=True).distinct()
+    for user_id in followers:
+        trim(user_id)
+
+
+def rebuild():
+    """
+    Собирает все ленты заново по подпискам: последние TIMELINE_LENGTH
+    постов каждому пользователю одним INSERT ... SELECT.
+    """
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT user_id, post_id, pub_date FROM ('
+            '  SELECT f.user_id AS user_id, p.id AS post_id,'
+            '    p.pub_date AS pub_date, ROW_NUMBER() OVER ('
+            '      PARTITION BY f.user_id ORDER BY p.pub_date DESC, p.id DESC'
+            '    ) AS position'
+            f'  FROM {Follow._meta.db_table} f'
+            f'  JOIN {Post._meta.db_table} p ON p.author_id = f.author_id'
+            f'  LEFT JOIN {UserStats._meta.db_table} s'
+            '    ON s.user_id = f.author_id'
+            '  WHERE COALESCE(s.followers_count, 0) <= %s'
+            ') ranked WHERE position <= %s',
+            [FANOUT_LIMIT, TIMELINE_LENGTH],
+        )
+
+
+def backfill(user_id, author_id):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    if celebrity_ids([author_id]):
+        return
+    posts = Post.objects.filter(author=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author=author_id
+    ).delete()
+
+
+def trim(user_id):
+    """Обрезает ленту пользователя до TIMELINE_LENGTH записей."""
+    boundary = TimelineEntry.objects.filter(user=user_id).values_list(
+        'pub_date', flat=True
+    )[TIMELINE_LENGTH:TIMELINE_LENGTH + 1]
+    if boundary:
+        TimelineEntry.objects.filter(
+            user=user_id, pub_date__lte=boundary[0]
+        ).delete()
+
+
+def _celebrities_version():
+    return caching.versions(('celebrities',))[0]
+
+
+def followed_celebrities(user_id):
+    """Крупные авторы среди подписок пользователя, из кэша."""
+    key = CELEBRITIES_KEY.format(
+        user_id=user_id, version=_celebrities_version()
+    )
+    ids = shared_cache().get(key)
+    if ids is None:
+        ids = celebrity_ids(
+            Follow.objects.filter(user=user_id).values('author')
+        )
+        shared_cache().set(key, ids, CELEBRITIES_TIMEOUT)
+    return ids
+
+
+def forget_celebrities(user_id):
+    caching.now_and_after_commit(lambda: shared_cache().delete(
+        CELEBRITIES_KEY.format(
+            user_id=user_id, version=_celebrities_version()
+        )
+    ))
+
+
+def followers_changed(author_id, delta):
+    """Поднимает версию крупных авторов, если автор пересёк FANOUT_LIMIT."""
+    boundary = FANOUT_LIMIT + 1 if delta > 0 else FANOUT_LIMIT
+    if UserStats.objects.filter(
+        user=author_id, followers_count=boundary
+    ).exists():
+        caching.bump('celebrities')
+
+
+def feed(user):
+    """
+    Посты ленты подписок и поля ключа их пагинации (см. KeysetPaginator).
+
+    Без крупных авторов посты читаются через записи ленты, и страницы
+    режутся по полям записи; с ними — по полям самих постов.
+    """
+    celebrities = followed_celebrities(user.pk)
+    posts = Post.objects.for_feed()
+    if not celebrities:
+        return posts.filter(timeline_entries__user=user), ENTRY_KEY
+    return posts.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    ), POST_KEY
@@ -0,0 +1,164 @@
+"""
+Популярные посты и группы с затуханием по времени.
+
+События вовлечённости (комментарии, новые подписчики автора, просмотры)
+складываются в почасовые корзины таблицы TrendingBucket одним
+INSERT ... ON CONFLICT DO UPDATE, без агрегатов по постам и
+комментариям. Корзины старше окна WINDOW_BUCKETS удаляются, а вклад
+остальных затухает вдвое за HALF_LIFE.
+
+refresh() пересчитывает рейтинг по корзинам окна и кладёт готовые
+списки id в кэш; страница читает один ключ кэша и одну страницу постов
+по первичному ключу. Устаревший рейтинг обновляется в фоновом пуле,
+а manage.py refresh_trending делает то же по расписанию.
+"""
+import heapq
+import logging
+import time
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from core.cache_backends import shared_cache
+
+from . import caching, thumbnails
+from .models import Group, Post, TrendingBucket
+from .utils import POSTS_ON_PAGE, WindowPaginator
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS: int = 60 * 60  # корзина — час
+WINDOW_BUCKETS: int = 48  # события старше двух суток не учитываются
+HALF_LIFE: int = 6 * 60 * 60  # за сколько секунд вклад падает вдвое
+REFRESH_INTERVAL: int = 60  # как часто пересчитывать рейтинг
+TRENDING_POSTS: int = 200
+TRENDING_GROUPS: int = 10
+RANKING_KEY: str = 'trending:{kind}'
+REFRESH_LOCK_KEY: str = 'trending:refresh'
+COMMENT = 'comment'
+FOLLOW = 'follow'
+VIEW = 'view'
+WEIGHTS = {
+    COMMENT: 3.0,
+    FOLLOW: 2.0,
+    VIEW: 0.1,
+}
+
+
+def _bucket(now=None):
+    return int((now or time.time()) // BUCKET_SECONDS)
+
+
+def record(event, post_id, group_id=None, count=1, now=None):
+    """Засчитывает count событий event посту и его группе."""
+    score = WEIGHTS[event] * count
+    bucket = _bucket(now)
+    rows = [(TrendingBucket.POST, post_id, bucket, score)]
+    if group_id is not None:
+        rows.append((TrendingBucket.GROUP, group_id, bucket, score))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TrendingBucket._meta.db_table} '
+            '(kind, object_id, bucket, score) VALUES (%s, %s, %s, %s) '
+            'ON CONFLICT (kind, object_id, bucket) '
+            'DO UPDATE SET score = score + excluded.score',
+            rows,
+        )
+
+
+def record_follow(author_id):
+    """Новый подписчик поднимает последний пост автора."""
+    latest = Post.objects.filter(author=author_id).values_list(
+        'pk', 'group'
+    ).order_by('-pub_date', '-pk')[:1]
+    for post_id, group_id in latest:
+        record(FOLLOW, post_id, group_id)
+
+
+def scores(now=None):
+    """Затухшие суммы по окну: {вид: {id: балл}}."""
+    current = _bucket(now)
+    decay = 0.5 ** (BUCKET_SECONDS / HALF_LIFE)
+    totals = {TrendingBucket.POST: defaultdict(float),
+              TrendingBucket.GROUP: defaultdict(float)}
+    rows = TrendingBucket.objects.filter(
+        bucket__gt=current - WINDOW_BUCKETS
+    ).values_list('kind', 'object_id', 'bucket', 'score')
+    for kind, object_id, bucket, score in rows.iterator():
+        totals[kind][object_id] += score * decay ** (current - bucket)
+    return totals
+
+
+def refresh(now=None):
+    """Пересчитывает рейтинги и кладёт их в кэш."""
+    TrendingBucket.objects.filter(
+        bucket__lte=_bucket(now) - WINDOW_BUCKETS
+    ).delete()
+    totals = scores(now)
+    limits = {
+        TrendingBucket.POST: TRENDING_POSTS,
+        TrendingBucket.GROUP: TRENDING_GROUPS,
+    }
+    for kind, limit in limits.items():
+        ranked = heapq.nlargest(
+            limit, totals[kind].items(),
+            key=lambda item: (item[1], item[0]),
+        )
+        shared_cache().set(
+            RANKING_KEY.format(kind=kind),
+            {
+                'ids': [object_id for object_id, _ in ranked],
+                'refreshed': time.time(),
+            },
+            None,
+        )
+    caching.bump('trending')
+
+
+def _refresh_in_worker():
+    try:
+        refresh()
+    except Exception:
+        logger.exception('Не удалось пересчитать популярное')
+    finally:
+        connection.close()
+
+
+def ranking(kind):
+    """
+    Готовый список id по убыванию популярности.
+
+    Пустой кэш заполняется сразу, устаревший рейтинг отдаётся как есть,
+    а пересчёт уходит в фоновый пул — не чаще REFRESH_INTERVAL.
+    """
+    shared = shared_cache()
+    entry = shared.get(RANKING_KEY.format(kind=kind))
+    if entry is None:
+        refresh()
+        entry = shared.get(RANKING_KEY.format(kind=kind), {'ids': []})
+    elif time.time() - entry['refreshed'] > REFRESH_INTERVAL and shared.add(
+        REFRESH_LOCK_KEY, True, REFRESH_INTERVAL
+    ):
+        transaction.on_commit(
+            lambda: thumbnails.get_executor().submit(_refresh_in_worker)
+        )
+    return entry['ids']
+
+
+def page(number):
+    """Страница популярных постов: срез списка и один запрос по pk."""
+    paginator = WindowPaginator(ranking(TrendingBucket.POST), POSTS_ON_PAGE)
+    page_obj = paginator.get_page(number)
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    # Удалённые после пересчёта посты просто пропускаются.
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    return page_obj
+
+
+def groups():
+    """Популярные группы по порядку рейтинга."""
+    ids = ranking(TrendingBucket.GROUP)
+    found = Group.objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,317 @@
+"""
+Докачиваемая загрузка картинок по частям.
+
+Клиент открывает загрузку (POST /uploads/ с размером файла) и получает
+токен, затем шлёт части PUT-запросами с заголовком Upload-Offset.
+Части пишутся прямо во временный файл в MEDIA_ROOT/uploads, тело
+запроса читается потоком и в память целиком не попадает. По первым
+байтам проверяется сигнатура формата, по заголовку — формат и размеры
+картинки (Image.open читает только заголовок, без декодирования).
+После последней части картинка перекодируется без EXIF в фоновом пуле.
+Клиент опрашивает GET загрузки до состояния ready и передаёт токен
+вместе с формой поста параметром upload; запрос поста перекодирования
+не ждёт, а один токен прикрепляется только к одному посту.
+
+Состояние загрузки лежит рядом с файлом в JSON, поэтому докачка
+работает через любой воркер с общим MEDIA_ROOT.
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import thumbnails
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR: str = 'uploads'  # каталог внутри MEDIA_ROOT
+UPLOAD_SALT: str = 'posts.upload'
+MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024
+MAX_CHUNK_SIZE: int = 8 * 1024 * 1024
+HEADER_BYTES: int = 64 * 1024  # с этого объёма пробуем разобрать заголовок
+MAX_HEADER_BYTES: int = 1024 * 1024  # дальше заголовок уже не ищем
+READ_SIZE: int = 64 * 1024
+UPLOAD_TTL: int = 60 * 60 * 24  # недокачанные файлы живут сутки
+SIGNATURES = {
+    b'\xff\xd8\xff': 'JPEG',
+    b'\x89PNG\r\n\x1a\n': 'PNG',
+    b'GIF87a': 'GIF',
+    b'GIF89a': 'GIF',
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+UPLOADING = 'uploading'
+PROCESSING = 'processing'
+READY = 'ready'
+ATTACHED = 'attached'
+FAILED = 'failed'
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _directory():
+    path = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _part_path(upload_id):
+    return os.path.join(_directory(), f'{upload_id}.part')
+
+
+def _meta_path(upload_id):
+    return os.path.join(_directory(), f'{upload_id}.json')
+
+
+def _load(upload_id):
+    try:
+        with open(_meta_path(upload_id), encoding='utf-8') as meta:
+            return json.load(meta)
+    except FileNotFoundError:
+        raise UploadError('Загрузка не найдена', status=404)
+
+
+def _save(upload_id, meta):
+    path = _meta_path(upload_id)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as temporary:
+        json.dump(meta, temporary)
+    os.replace(f'{path}.tmp', path)
+
+
+def _discard(upload_id):
+    for path in (_part_path(upload_id), _meta_path(upload_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def start(user, size, filename=''):
+    """Открывает загрузку файла размером size и возвращает токен."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Укажите размер файла')
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise UploadError(
+            f'Размер файла должен быть от 1 байта до {MAX_UPLOAD_SIZE} байт',
+            status=413,
+        )
+    upload_id = uuid.uuid4().hex
+    open(_part_path(upload_id), 'wb').close()
+    _save(upload_id, {
+        'user': user.pk,
+        'size': size,
+        'filename': os.path.basename(filename or ''),
+        'created': time.time(),
+        'state': UPLOADING,
+        'format': None,
+    })
+    return signing.dumps([upload_id, user.pk], salt=UPLOAD_SALT)
+
+
+def resolve(token, user):
+    """id загрузки по токену; чужой или поддельный токен — 404."""
+    try:
+        upload_id, user_id = signing.loads(token, salt=UPLOAD_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise UploadError('Загрузка не найдена', status=404)
+    if user_id != user.pk:
+        raise UploadError('Загрузка не найдена', status=404)
+    return upload_id
+
+
+def status(upload_id):
+    meta = _load(upload_id)
+    try:
+        offset = os.path.getsize(_part_path(upload_id))
+    except FileNotFoundError:
+        offset = meta['size']
+    return {
+        'offset': offset,
+        'size': meta['size'],
+        'state': meta['state'],
+        'error': meta.get('error'),
+    }
+
+
+def _sniff(path):
+    with open(path, 'rb') as part:
+        head = part.read(8)
+    if len(head) < 8:
+        return True
+    return any(head.startswith(signature) for signature in SIGNATURES)
+
+
+def _check_header(path):
+    """Формат по заголовку; None — заголовок ещё не докачан."""
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise UploadError('Слишком большое изображение')
+    except (OSError, SyntaxError):
+        return None
+    if image_format not in EXTENSIONS:
+        raise UploadError(f'Формат {image_format} не поддерживается')
+    if not width or not height:
+        raise UploadError('Некорректный размер изображения')
+    return image_format
+
+
+def _write(upload_id, meta, offset, stream, length):
+    """Пишет часть в файл под блокировкой; возвращает принятый объём."""
+    with open(_part_path(upload_id), 'ab') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Часть уже принимается', status=409)
+        current = part.seek(0, os.SEEK_END)
+        if offset != current:
+            raise UploadError(
+                'Неверное смещение', status=409, offset=current
+            )
+        if current + length > meta['size']:
+            raise UploadError('Данных больше, чем заявлено')
+        remaining = length
+        while remaining:
+            chunk = stream.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            part.write(chunk)
+            remaining -= len(chunk)
+        part.flush()
+        return part.tell()
+
+
+def _validate(path, meta, received, complete):
+    if not _sniff(path):
+        raise UploadError('Файл не является изображением')
+    if meta['format'] is not None or (
+        received < HEADER_BYTES and not complete
+    ):
+        return
+    meta['format'] = _check_header(path)
+    if meta['format'] is None and (complete or received >= MAX_HEADER_BYTES):
+        raise UploadError('Не удалось разобрать изображение')
+
+
+def append(upload_id, offset, stream, length):
+    """
+    Дописывает часть длиной length из stream с позиции offset.
+
+    Позиция должна совпасть с уже принятым объёмом, иначе 409 с текущим
+    смещением: клиент докачивает с него.
+    """
+    meta = _load(upload_id)
+    if meta['state'] != UPLOADING:
+        raise UploadError('Загрузка уже завершена', status=409)
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError('Слишком большая часть', status=413)
+    received = _write(upload_id, meta, offset, stream, length)
+    complete = received == meta['size']
+    try:
+        _validate(_part_path(upload_id), meta, received, complete)
+    except UploadError:
+        _discard(upload_id)
+        raise
+    if complete:
+        meta['state'] = PROCESSING
+    _save(upload_id, meta)
+    if complete:
+        thumbnails.get_executor().submit(_process_in_worker, upload_id)
+    return status(upload_id)
+
+
+def process(upload_id):
+    """Перекодирует картинку без EXIF и кладёт её к картинкам постов."""
+    meta = _load(upload_id)
+    path = _part_path(upload_id)
+    with Image.open(path) as image:
+        image_format = image.format
+        if image_format == 'GIF':
+            # GIF может быть анимированным и EXIF не несёт: как есть.
+            with open(path, 'rb') as source:
+                content = source.read()
+        else:
+            image = ImageOps.exif_transpose(image)
+            buffer = BytesIO()
+            options = {'quality': 90} if image_format == 'JPEG' else {}
+            image.save(buffer, image_format, **options)
+            content = buffer.getvalue()
+    name = default_storage.save(
+        f'posts/{upload_id}.{EXTENSIONS[image_format]}',
+        ContentFile(content),
+    )
+    os.remove(path)
+    meta.update(state=READY, name=name)
+    _save(upload_id, meta)
+
+
+def _process_in_worker(upload_id):
+    try:
+        process(upload_id)
+    except Exception as error:
+        logger.exception('Не удалось обработать загрузку %s', upload_id)
+        meta = _load(upload_id)
+        meta.update(state=FAILED, error=str(error))
+        _save(upload_id, meta)
+
+
+def attach(token, user):
+    """
+    Имя готового файла для Post.image по токену загрузки.
+
+    Не готовая ещё загрузка сразу даёт ошибку: ждать фоновый пул
+    в запросе значило бы держать воркер. Уже прикреплённая тоже.
+    """
+    upload_id = resolve(token, user)
+    meta = _load(upload_id)
+    if meta['state'] == UPLOADING:
+        raise UploadError('Файл загружен не полностью')
+    if meta['state'] == PROCESSING:
+        raise UploadError('Файл ещё обрабатывается, попробуйте позже')
+    if meta['state'] == FAILED:
+        raise UploadError(meta.get('error') or 'Файл не удалось обработать')
+    if meta['state'] == ATTACHED:
+        raise UploadError('Файл уже прикреплён к другому посту')
+    # Прикреплённый файл clean() уже не тронет.
+    meta['state'] = ATTACHED
+    _save(upload_id, meta)
+    return meta['name']
+
+
+def clean(max_age=UPLOAD_TTL):
+    """Удаляет недокачанные и неиспользованные загрузки старше max_age."""
+    removed = 0
+    threshold = time.time() - max_age
+    for entry in os.scandir(_directory()):
+        if not entry.name.endswith('.json'):
+            continue
+        upload_id = entry.name[:-len('.json')]
+        try:
+            meta = _load(upload_id)
+        except UploadError:
+            continue
+        if meta['created'] >= threshold:
+            continue
+        if meta['state'] == READY:
+            default_storage.delete(meta['name'])
+        _discard(upload_id)
+        removed += 1
+    return removed
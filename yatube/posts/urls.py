@@ -6,11 +6,35 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending_index, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.post_search, name='search'),
+    path('feed/<str:feed_format>/', views.feed, name='feed'),
+    path(
+        'group/<slug:slug>/feed/<str:feed_format>/',
+        views.group_feed,
+        name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feed/<str:feed_format>/',
+        views.profile_feed,
+        name='profile_feed'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('create/', views.post_create, name='post_create'),
+    path('uploads/', views.upload_start, name='upload_start'),
+    path(
+        'uploads/<str:token>/',
+        views.upload_chunk,
+        name='upload_chunk'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/',
+        views.comment_thread,
+        name='comment_thread'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -1,9 +1,219 @@
-from django.core.paginator import Paginator
+from django.core import signing
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 POSTS_ON_PAGE: int = 10  # кол-во постов для отображения на странице
+CURSOR_SALT: str = 'posts.cursor'
+FORWARD: str = 'f'
+BACKWARD: str = 'b'
+ELLIPSIS: str = '…'
+ON_EACH_SIDE: int = 2  # номеров страниц по сторонам от текущей
+ON_ENDS: int = 1  # номеров страниц в начале и в конце
 
 
-def paginations(request, posts):
-    paginator = Paginator(posts, POSTS_ON_PAGE)
+def encode_cursor(post, direction):
+    """Подписанный непрозрачный курсор на позицию (pub_date, id)."""
+    return encode_position(post.pub_date, post.pk, direction)
+
+
+def encode_position(pub_date, pk, direction=FORWARD):
+    return signing.dumps(
+        [pub_date.isoformat(), pk, direction],
+        salt=CURSOR_SALT,
+    )
+
+
+def decode_cursor(token):
+    """Разбирает курсор; для подделанного или битого токена вернёт None."""
+    try:
+        raw_date, pk, direction = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    pub_date = parse_datetime(raw_date) if isinstance(raw_date, str) else None
+    if (
+        pub_date is None
+        or not isinstance(pk, int)
+        or direction not in (FORWARD, BACKWARD)
+    ):
+        return None
+    return pub_date, pk, direction
+
+
+def page_window(number, num_pages, on_each_side=ON_EACH_SIDE,
+                on_ends=ON_ENDS):
+    """
+    Номера страниц вокруг текущей с многоточиями на месте пропусков.
+
+    Длина окна не зависит от числа страниц: 1 … 4 5 [6] 7 8 … 40.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    window = []
+    if number > on_each_side + on_ends + 1:
+        window.extend(range(1, on_ends + 1))
+        window.append(ELLIPSIS)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(ELLIPSIS)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+class WindowPaginator(Paginator):
+    """
+    Paginator с заранее известным числом строк и окном номеров страниц.
+
+    Если count передан (денормализованный счётчик или counters.count),
+    COUNT(*) не выполняется; у страниц есть window для шаблона.
+    """
+
+    ELLIPSIS = ELLIPSIS
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return super().count
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.window = page_window(page.number, self.num_pages)
+        return page
+
+
+class CursorPage(Page):
+    """
+    Страница, полученная по курсору.
+
+    Номер страницы неизвестен (он потребовал бы COUNT и OFFSET), поэтому
+    number равен None, а навигация идёт через next_cursor/previous_cursor.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = None
+        self.previous_cursor = None
+        if self.object_list:
+            if has_next:
+                self.next_cursor = encode_cursor(self.object_list[-1], FORWARD)
+            if has_previous:
+                self.previous_cursor = encode_cursor(
+                    self.object_list[0], BACKWARD
+                )
+
+    def __repr__(self):
+        return '<Page cursor=%s>' % (self.cursor or '-')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return None
+
+    def previous_page_number(self):
+        return None
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class KeysetPaginator(WindowPaginator):
+    """
+    Пагинатор постов с ключом (pub_date, id).
+
+    Обычные страницы (?page=N) работают как у Paginator, но дополнительно
+    получают курсоры соседних страниц. Переход по ?cursor= не выполняет
+    ни COUNT(*), ни OFFSET: выборка — диапазон по индексу от позиции
+    курсора, поэтому её цена не зависит от глубины страницы.
+
+    key — поля даты и id, по которым сортируются и режутся страницы;
+    их значения должны совпадать с pub_date и pk поста (например,
+    поля записи ленты подписок, у которой свой индекс).
+    """
+
+    key = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, key=None, **kwargs):
+        if key is not None:
+            self.key = key
+        super().__init__(
+            object_list.order_by(*self.ordering(descending=True)),
+            per_page, **kwargs,
+        )
+
+    def ordering(self, descending):
+        # F(), а не строки: строкой поле-ForeignKey сортировалось бы
+        # по Meta.ordering связанной модели через лишний JOIN.
+        return [
+            F(field).desc() if descending else F(field).asc()
+            for field in self.key
+        ]
+
+    def _get_page(self, object_list, number, paginator):
+        page = super()._get_page(list(object_list), number, paginator)
+        page.cursor = None
+        page.next_cursor = None
+        page.previous_cursor = None
+        if page.object_list:
+            if page.has_next():
+                page.next_cursor = encode_cursor(page.object_list[-1], FORWARD)
+            if page.has_previous():
+                page.previous_cursor = encode_cursor(
+                    page.object_list[0], BACKWARD
+                )
+        return page
+
+    def get_cursor_page(self, cursor):
+        """Страница по курсору; невалидный курсор даёт первую страницу."""
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self.get_page(1)
+        pub_date, pk, direction = position
+        # Поля ключа — через annotate(): для полей связанной записи он,
+        # в отличие от filter(), переиспользует JOIN выборки.
+        rows = self.object_list.annotate(
+            key_date=F(self.key[0]), key_pk=F(self.key[1])
+        )
+        if direction == FORWARD:
+            rows = rows.filter(
+                Q(key_date__lt=pub_date) | Q(key_date=pub_date, key_pk__lt=pk)
+            )
+        else:
+            rows = rows.filter(
+                Q(key_date__gt=pub_date) | Q(key_date=pub_date, key_pk__gt=pk)
+            ).order_by(*self.ordering(descending=False))
+        rows = list(rows[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == FORWARD:
+            return CursorPage(rows, self, has_more, True, cursor)
+        rows.reverse()
+        return CursorPage(rows, self, True, has_more, cursor)
+
+
+def paginations(request, posts, count=None, key=None):
+    paginator = KeysetPaginator(posts, POSTS_ON_PAGE, key=key, count=count)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_cursor_page(cursor)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
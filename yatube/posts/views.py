@@ -1,73 +1,258 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, User, Follow
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_http_methods
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import paginations
+from .utils import POSTS_ON_PAGE, paginations
+from . import (
+    caching, counters, feeds, followed, pageviews, search, suggestions,
+    threads, thumbnails, timeline, trending, uploads,
+)
 
 
+@caching.cache_anonymous_page
 def index(request):
-    posts = Post.objects.select_related('group').all()
-    page_obj = paginations(request, posts)
+    caching.depends_on(request, 'posts', 'groups', 'users')
+    posts = Post.objects.for_feed()
+    page_obj = paginations(
+        request, posts,
+        counters.count('posts', posts, ('posts',), estimated=True),
+    )
     context = {
         'page_obj': page_obj,
+        'followed': followed.for_user(request.user),
     }
     return render(request, 'posts/index.html', context)
 
 
+@caching.cache_anonymous_page
+def trending_index(request):
+    caching.depends_on(request, 'trending', 'posts', 'groups', 'users')
+    context = {
+        'page_obj': trending.page(request.GET.get('page')),
+        'groups': trending.groups(),
+        'trending': True,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@caching.cache_anonymous_page
 def group_posts(request, slug):
+    caching.depends_on(request, 'groups', f'group:{slug}', 'users')
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
-    page_obj = paginations(request, posts)
+    posts = group.group_posts.for_feed()
+    page_obj = paginations(request, posts, group.posts_count)
     context = {
         'posts': posts,
         'page_obj': page_obj,
         'group': group,
+        'followed': followed.for_user(request.user),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@caching.cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    all_posts = posts.count()
-    following = Follow.objects.filter(
-        user=request.user.id, author=author
+    caching.depends_on(request, 'groups', f'author:{username}')
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
     )
-    page_obj = paginations(request, posts)
+    posts = author.posts.for_feed()
+    stats = counters.user_stats(author)
+    following = author.pk in followed.for_user(request.user)
+    page_obj = paginations(request, posts, stats.posts_count)
     context = {
         'author': author,
         'following': following,
         'page_obj': page_obj,
-        'all_posts': all_posts,
+        'all_posts': stats.posts_count,
+        'stats': stats,
     }
+    if request.user.is_authenticated:
+        # Анонимам рекомендаций нет: их страница кэшируется целиком.
+        context['suggestions'] = [
+            suggestion for suggestion in suggestions.for_user(request.user)
+            if suggestion['username'] != author.username
+        ]
     return render(request, 'posts/profile.html', context)
 
 
+def feed(request, feed_format):
+    return feeds.respond(
+        request, feed_format, Post.objects.all(),
+        lambda: ('Последние обновления на сайте', reverse('posts:index')),
+        ('posts', 'groups', 'users'),
+    )
+
+
+def group_feed(request, slug, feed_format):
+    def describe():
+        group = get_object_or_404(Group, slug=slug)
+        return group.title, reverse('posts:group_list', args=(slug,))
+    return feeds.respond(
+        request, feed_format, Post.objects.filter(group__slug=slug),
+        describe, ('groups', f'group:{slug}', 'users'),
+    )
+
+
+def profile_feed(request, username, feed_format):
+    def describe():
+        author = get_object_or_404(User, username=username)
+        return (
+            f'Посты {author.get_full_name() or author.username}',
+            reverse('posts:profile', args=(username,)),
+        )
+    return feeds.respond(
+        request, feed_format, Post.objects.filter(author__username=username),
+        describe, ('groups', f'author:{username}', 'users'),
+    )
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = [], None
+    if query:
+        posts, next_cursor = search.search(
+            query, request.GET.get('cursor'), POSTS_ON_PAGE
+        )
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@pageviews.counted
+@caching.cache_anonymous_page(timeout=pageviews.STALE_COUNTS)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    all_posts = post.author.posts.all().count()
-    comments = post.comments.all()
+    caching.depends_on(request, f'post:{post_id}', 'users', 'groups')
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    caching.depends_on(request, f'author:{post.author.username}')
+    if post.group:
+        caching.depends_on(request, f'group:{post.group.slug}')
+    all_posts = counters.user_stats(post.author).posts_count
+    comments = threads.page(
+        post.comments.select_related('author'), request.GET.get('comments')
+    )
     form = CommentForm()
     context = {
         'post': post,
         'all_posts': all_posts,
         'form': form,
         'comments': comments,
+        'followed': followed.for_user(request.user),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@caching.cache_anonymous_page
+def comment_thread(request, post_id, comment_id):
+    caching.depends_on(request, f'post:{post_id}', 'users')
+    root = get_object_or_404(
+        Comment.objects.select_related('author', 'post'),
+        pk=comment_id, post=post_id,
+    )
+    comments = threads.page(
+        threads.subtree(root).select_related('author'),
+        request.GET.get('comments'),
+    )
+    context = {
+        'post': root.post,
+        'root': root,
+        'comments': comments,
+        'form': CommentForm(),
+    }
+    return render(request, 'posts/comment_thread.html', context)
+
+
+def _attach_upload(request, form):
+    """
+    Подставляет в пост картинку, загруженную по частям.
+
+    Токен приходит отдельным параметром upload, а не полем PostForm.
+    """
+    token = request.POST.get('upload')
+    if not token:
+        return True
+    try:
+        form.instance.image = uploads.attach(token, request.user)
+    except uploads.UploadError as error:
+        form.add_error('image', str(error))
+        return False
+    return True
+
+
+def _upload_response(data, status=200):
+    response = JsonResponse(data, status=status)
+    if 'offset' in data:
+        response['Upload-Offset'] = data['offset']
+    return response
+
+
+@login_required
+@require_http_methods(['POST'])
+def upload_start(request):
+    try:
+        token = uploads.start(
+            request.user,
+            request.POST.get('size'),
+            request.POST.get('filename', ''),
+        )
+    except uploads.UploadError as error:
+        return _upload_response({'detail': str(error)}, error.status)
+    return _upload_response({
+        'token': token,
+        'offset': 0,
+        'url': reverse('posts:upload_chunk', args=(token,)),
+    }, 201)
+
+
 @login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def upload_chunk(request, token):
+    """GET — сколько уже принято, PUT — следующая часть файла."""
+    try:
+        upload_id = uploads.resolve(token, request.user)
+        if request.method != 'PUT':
+            return _upload_response(uploads.status(upload_id))
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            raise uploads.UploadError(
+                'Нужны заголовки Upload-Offset и Content-Length'
+            )
+        # request читается потоком: тело части не буферизуется целиком.
+        return _upload_response(
+            uploads.append(upload_id, offset, request, length)
+        )
+    except uploads.UploadError as error:
+        data = {'detail': str(error)}
+        if error.offset is not None:
+            data['offset'] = error.offset
+        return _upload_response(data, error.status)
+
+
+@login_required
+@transaction.atomic
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(
             request.POST,
             files=request.FILES or None,
         )
-        if form.is_valid():
+        if form.is_valid() and _attach_upload(request, form):
             form = form.save(commit=False)
             form.author = request.user
             form.save()
+            thumbnails.schedule(form)
             return redirect(
                 'posts:profile',
                 form.author
@@ -78,6 +263,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -89,8 +275,15 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post
     )
-    if form.is_valid():
+    if form.is_valid() and _attach_upload(request, form):
+        image_changed = (
+            'image' in form.changed_data or bool(request.POST.get('upload'))
+        )
+        if image_changed:
+            post.thumbnails = ''
         form.save()
+        if image_changed:
+            thumbnails.schedule(post)
         return redirect(
             'posts:post_detail', post_id
         )
@@ -100,41 +293,72 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
+    parent_id = request.POST.get('parent')
+    parent = None
+    if parent_id:
+        # Ответ в ветку: parent — отдельный параметр, не поле формы.
+        try:
+            parent = threads.resolve_parent(post_id, parent_id)
+        except Comment.DoesNotExist:
+            raise Http404('Комментарий не найден')
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = parent
         comment.save()
+    if parent is not None:
+        return redirect(
+            'posts:comment_thread', post_id, threads.root_id(parent.path)
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user)
-    page_obj = paginations(request, posts)
+    posts, key = timeline.feed(request.user)
+    page_obj = paginations(request, posts, counters.count(
+        f'feed:{request.user.pk}', posts,
+        ('posts', f'author:{request.user.username}'),
+    ), key=key)
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def _redirect_back(request, username):
+    """Обратно на страницу с кнопкой (?next=) или в профиль автора."""
+    next_url = request.GET.get('next')
+    if next_url and is_safe_url(
+        next_url,
+        allowed_hosts={request.get_host()},
+        require_https=request.is_secure(),
+    ):
+        return redirect(next_url)
+    return redirect('posts:profile', username)
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     follower = request.user
     if follower != author:
         Follow.objects.get_or_create(user=follower, author=author)
-    return redirect('posts:profile', username)
+    return _redirect_back(request, username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user,
         author__username=username
     ).delete()
-    return redirect('posts:profile', username)
+    return _redirect_back(request, username)
@@ -0,0 +1,61 @@
+"""
+Загрузка пользователя запроса из кэша.
+
+AuthenticationMiddleware на каждый запрос залогиненного пользователя
+читает строку auth_user. Здесь пользователь берётся из кэша
+USER_CACHE_ALIAS, а в БД идёт только промах — через обычный
+django.contrib.auth.get_user со всеми его проверками.
+
+Запись в кэше принимается, только если хэш пароля в ней даёт тот же
+хэш сессии, что записан в сессию при входе. Поэтому смена пароля
+(сигнал удаляет запись, новая не совпадёт со старыми сессиями) и
+чужой пользователь с тем же id после пересоздания БД не пропустят
+устаревшую сессию.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+USER_KEY: str = 'user:{user_id}'
+USER_TIMEOUT: int = 60 * 60  # час; при изменении запись удаляется
+
+
+def _cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def _cached(request):
+    """Пользователь сессии из кэша или None."""
+    session = request.session
+    try:
+        user_id = auth.get_user_model()._meta.pk.to_python(
+            session[auth.SESSION_KEY]
+        )
+        backend = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return None
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if not session_hash or backend not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    user = _cache().get(USER_KEY.format(user_id=user_id))
+    if user is None or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        return None
+    return user
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но с пользователем из кэша."""
+    user = _cached(request)
+    if user is not None:
+        return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        _cache().set(USER_KEY.format(user_id=user.pk), user, USER_TIMEOUT)
+    return user
+
+
+def forget(user_id):
+    _cache().delete(USER_KEY.format(user_id=user_id))
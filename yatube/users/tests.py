@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from users import auth
+
+User = get_user_model()
+
+
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='Lev', password='old-password'
+        )
+        self.client = Client()
+        self.client.login(username='Lev', password='old-password')
+
+    def test_session_and_user_come_from_cache(self):
+        """Второй запрос не читает ни django_session, ни auth_user."""
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_profile_update_reloads_user(self):
+        self.client.get(reverse('about:author'))
+        self.user.first_name = 'Лев'
+        self.user.save()
+        response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'].first_name, 'Лев')
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse('about:author'))
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_stale_entry_of_another_user_is_ignored(self):
+        """Чужой пользователь с тем же id (после пересоздания БД)."""
+        stranger = User(pk=self.user.pk, username='Stranger')
+        stranger.set_password('other-password')
+        caches[settings.USER_CACHE_ALIAS].set(
+            auth.USER_KEY.format(user_id=self.user.pk), stranger
+        )
+        response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'].username, 'Lev')
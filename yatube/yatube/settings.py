@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +26,9 @@ SECRET_KEY = 'dhk_a#2hw*4tc(-a=yj8o=^+#^w*hj%lgb(%d3%5v0y-xmc(-1'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Запуск тестов (manage.py test или pytest): фоновые потоки не стартуют.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -46,16 +50,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
 
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -137,6 +143,11 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
+# manage.py collectstatic кладёт сюда файлы с хэшем в имени и их .gz/.br,
+# а yatube/wsgi.py отдаёт их сам (см. core/staticfiles.py).
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -148,10 +159,61 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Память процесса (L1) перед общим для всех процессов кэшем в файле
+# SQLite (см. core/cache_backends.py). Для одного процесса без диска
+# подойдёт 'django.core.cache.backends.locmem.LocMemCache'.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'LOCATION': 'l1',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'MAX_ENTRIES': 5_000,
+            'MAX_SIZE': 32 * 1024 * 1024,
+            'L1_TIMEOUT': 60,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
+}
+if TESTING:
+    # Тесты чистят кэш и не должны трогать файл с сессиями и версиями
+    # работающего сервера: общий уровень в памяти процесса.
+    CACHES['shared'] = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared-tests',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
     }
-}
+
+# Сессии читаются из общего кэша, в django_session пишутся только при
+# изменении (вход, выход, сообщения): чтение сессии не ходит в основную
+# БД и не спорит за неё с записью постов. Пользователь запроса тоже
+# берётся из общего кэша (users/auth.py). Общий, а не двухуровневый
+# кэш: выход и смена пароля должны сразу дойти до всех воркеров.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+USER_CACHE_ALIAS = 'shared'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Замеры запросов (core/middleware.py): заголовок Server-Timing и отчёт
+# по перцентилям на /instrumentation/ и в manage.py instrumentation_report.
+# Заголовок получают только персонал и адреса из INTERNAL_IPS.
+INSTRUMENTATION_ENABLED = DEBUG
+INTERNAL_IPS = ['127.0.0.1', '::1']
+INSTRUMENTATION_WINDOW = 1000  # последних запросов на каждое имя URL
+
+# Фоновый поток сброса просмотров (posts/pageviews.py). В тестах
+# выключен: буфер сбрасывается явным вызовом pageviews.flush().
+PAGEVIEWS_BACKGROUND = not TESTING
+
+# Миниатюры постов (posts/thumbnails.py) строятся в фоновом пуле. В тестах
+# — сразу после коммита: иначе поток пишет в MEDIA_ROOT уже после того,
+# как тест вернул настройки и удалил свой временный каталог.
+THUMBNAILS_BACKGROUND = not TESTING
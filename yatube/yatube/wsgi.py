@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from core.staticfiles import StaticFilesApp
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
-application = get_wsgi_application()
+# Собранная статика отдаётся до Django: без middleware и urlconf.
+application = StaticFilesApp(
+    get_wsgi_application(), settings.STATIC_ROOT, settings.STATIC_URL
+)